@@ -10,14 +10,20 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 import os
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from medic.routing import websocket_urlpatterns
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthapp.settings')
 
+django_asgi_app = get_asgi_application()
+
+# These import models, so they have to wait for the app registry
+from medic.routing import websocket_urlpatterns  # noqa: E402
+from medic.tasks import LifespanApp  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
+    "lifespan": LifespanApp(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             websocket_urlpatterns
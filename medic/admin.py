@@ -1,6 +1,6 @@
 # Register your models here.
 from django.contrib import admin
-from .models import Location, Medic, Review, IdentityVerification, Expertise, Tag, Feedback, SocialAuthData, Booking
+from .models import Location, Medic, Review, IdentityVerification, Expertise, Tag, Feedback, SocialAuthData, Booking, OutboundSms, ChatMessage, UploadSession
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 from .models import CustomUser
@@ -60,4 +60,16 @@ admin.site.register(CustomUser, CustomUserAdmin)
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
-    list_display = ['medic', 'patient', 'status', 'created_at', 'updated_at', 'id']
\ No newline at end of file
+    list_display = ['medic', 'patient', 'status', 'created_at', 'updated_at', 'id']
+
+@admin.register(OutboundSms)
+class OutboundSmsAdmin(admin.ModelAdmin):
+    list_display = ['phone_number', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'id']
+
+@admin.register(ChatMessage)
+class ChatMessageAdmin(admin.ModelAdmin):
+    list_display = ['booking', 'sender', 'created_at']
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'purpose', 'medic', 'status', 'received_size', 'total_size', 'created_at']
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MedicConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'medic'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,194 @@
+"""
+Async versions of the booking lifecycle endpoints for the ASGI deployment.
+
+Reads use Django's async ORM and channel messages are awaited directly. This
+does not keep a request on the event loop: Django 4.2's async ORM still runs
+each query in a thread, and the middleware chain includes sync-only
+middleware (WhiteNoise, MediaFilesMiddleware, ReadYourWritesMiddleware), so
+Django runs the chain in a thread and calls back into the loop for the view.
+Making that middleware async-capable leaves django.contrib's middleware to
+run each hook in a thread instead, which measured slower.
+bench_booking_endpoints compares throughput with the sync views.
+"""
+import json
+from functools import wraps
+
+from channels.db import database_sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponseNotModified, JsonResponse, QueryDict
+
+from .bookings import (
+    BOOKING_VERSION_FIELDS, InvalidTransition, MedicUnavailable, booking_etag, initiate_booking, share_location,
+    transition, transition_booking,
+)
+from .cache import etag_matches
+from .models import Booking, CustomUser, Medic
+from .notifications import anotify_transitions
+from .serializers import BookingSerializer
+
+
+class BadRequest(Exception):
+    pass
+
+
+def async_api_view(methods):
+    """
+    Restrict an async view to `methods` and exempt it from CSRF checks, as
+    DRF's APIView does for the sync endpoints.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                return await view(request, *args, **kwargs)
+            except BadRequest as e:
+                return JsonResponse({'error': str(e)}, status=400)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            raise BadRequest('Malformed JSON.')
+    # Django only parses form bodies into request.POST for POST requests
+    if request.method != 'POST' and request.content_type == 'application/x-www-form-urlencoded':
+        return QueryDict(request.body, encoding=request.encoding)
+    return request.POST
+
+
+def booking_detail_queryset():
+    return BookingSerializer.setup_eager_loading(Booking.objects.all())
+
+
+async def serialize_booking(booking_id, status=200):
+    booking = await booking_detail_queryset().filter(id=booking_id).afirst()
+    return JsonResponse(BookingSerializer(booking).data, status=status)
+
+
+async def booking_response(request, version):
+    # 304 while the client's If-None-Match still matches the booking
+    etag = booking_etag(version)
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        booking = await booking_detail_queryset().aget(id=version['id'])
+        response = JsonResponse(BookingSerializer(booking).data)
+    response['ETag'] = etag
+    return response
+
+
+def not_found():
+    return JsonResponse({'detail': 'Not found.'}, status=404)
+
+
+@async_api_view(['POST'])
+async def initiate_booking_view(request):
+    data = request_data(request)
+    medic = await Medic.objects.filter(id=data.get('medic_id')).afirst() if data.get('medic_id') else None
+    patient = await CustomUser.objects.filter(email=data.get('patient_email')).afirst()
+    if medic is None or patient is None:
+        return not_found()
+
+    try:
+        booking, events = await database_sync_to_async(initiate_booking)(
+            patient, medic, latitude=data.get('latitude'), longitude=data.get('longitude'), notify=False
+        )
+    except MedicUnavailable:
+        return JsonResponse({'error': 'Medic is not available for booking.'}, status=400)
+    except IntegrityError:
+        # Another booking for this patient was created concurrently
+        return JsonResponse({'error': 'Patient already has an active booking.'}, status=409)
+
+    await anotify_transitions(events)
+    return await serialize_booking(booking.id, status=201)
+
+
+@async_api_view(['PUT', 'PATCH'])
+async def update_booking_view(request, pk):
+    booking = await Booking.objects.select_related('medic').filter(id=pk).afirst()
+    if booking is None:
+        return not_found()
+
+    try:
+        event = await database_sync_to_async(share_location)(booking, notify=False)
+    except InvalidTransition:
+        return JsonResponse({'error': 'Invalid booking status.'}, status=400)
+
+    await anotify_transitions([event])
+    return await serialize_booking(booking.id)
+
+
+async def transition_response(pk, target, message):
+    try:
+        event = await database_sync_to_async(transition_booking)(pk, target, notify=False)
+    except InvalidTransition:
+        return JsonResponse({'error': 'Invalid booking status.'}, status=400)
+
+    await anotify_transitions([event])
+    return JsonResponse({'status': message})
+
+
+@async_api_view(['PUT', 'PATCH'])
+async def confirm_booking_view(request, pk):
+    booking = await Booking.objects.filter(id=pk).afirst()
+    if booking is None:
+        return not_found()
+
+    # Verify OTP
+    if booking.otp != str(request_data(request).get('otp')):
+        return JsonResponse({'error': 'OTP is incorrect.'}, status=400)
+
+    return await transition_response(pk, 'confirmed', 'Booking confirmed.')
+
+
+@async_api_view(['PUT', 'PATCH'])
+async def complete_booking_view(request, pk):
+    if not await Booking.objects.filter(id=pk).aexists():
+        return not_found()
+    return await transition_response(pk, 'completed', 'Booking confirmed and completed.')
+
+
+@async_api_view(['PUT', 'PATCH'])
+async def cancel_booking_view(request, pk):
+    if not await Booking.objects.filter(id=pk).aexists():
+        return not_found()
+    return await transition_response(pk, 'cancelled', 'Booking cancelled.')
+
+
+@async_api_view(['POST'])
+async def recent_patient_booking_view(request):
+    email = request_data(request).get('email')
+    if not email:
+        return JsonResponse({'error': 'Email parameter is required'}, status=400)
+
+    version = await Booking.objects.filter(
+        patient__email=email, status__in=Booking.ACTIVE_STATUSES
+    ).order_by('-created_at').values(*BOOKING_VERSION_FIELDS).afirst()
+    if version is None:
+        return JsonResponse({'error': 'No active bookings found'}, status=404)
+    return await booking_response(request, version)
+
+
+@async_api_view(['POST'])
+async def recent_nurse_booking_view(request):
+    email = request_data(request).get('email')
+    if not email:
+        return JsonResponse({'error': 'Email parameter is required'}, status=400)
+
+    bookings = Booking.objects.filter(medic__user__email=email, status__in=Booking.ACTIVE_STATUSES)
+    version = await bookings.order_by('-created_at').values(*BOOKING_VERSION_FIELDS).afirst()
+    if version is None:
+        return JsonResponse({'error': 'No active bookings found'}, status=404)
+
+    # Older open bookings for this nurse are stale
+    stale = bookings.exclude(id=version['id'])
+    if await stale.aexists():
+        events = await database_sync_to_async(transition)(stale, 'cancelled', notify=False)
+        await anotify_transitions(events)
+    return await booking_response(request, version)
@@ -0,0 +1,198 @@
+import hashlib
+import random
+from collections import namedtuple
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_search_cache
+from .models import Booking, Medic
+from .notifications import notify_transitions
+from .outbox import enqueue_sms
+
+# One status change of one booking; source is None for a new booking
+BookingTransition = namedtuple('BookingTransition', ['booking_id', 'medic_id', 'patient_id', 'source', 'target'])
+
+# Target status -> statuses a booking may move into it from
+TRANSITIONS = {
+    'location_shared': ['initiated'],
+    'otp_sent': ['location_shared'],
+    'in_progress': ['location_shared', 'otp_sent'],
+    'confirmed': ['location_shared', 'otp_sent', 'in_progress'],
+    'completed': ['location_shared', 'otp_sent', 'in_progress', 'confirmed'],
+    'cancelled': ['initiated', 'location_shared', 'otp_sent', 'in_progress', 'confirmed'],
+}
+
+# Seconds a booking may sit in each status before the sweeper cancels it
+BOOKING_TIMEOUTS = getattr(settings, 'BOOKING_TIMEOUTS', {
+    'initiated': 15 * 60,
+    'location_shared': 2 * 60 * 60,
+})
+
+
+# Columns whose change alters a booking's serialized (depth=1) form; hashing
+# them gives an ETag without loading or serializing the booking
+BOOKING_VERSION_FIELDS = (
+    'id', 'status', 'updated_at', 'medic_location_updated_at', 'care_type_id', 'medic__updated_at',
+    'patient__email', 'patient__first_name', 'patient__last_name',
+)
+
+
+def booking_etag(version):
+    """
+    ETag for a booking given its BOOKING_VERSION_FIELDS values.
+    """
+    values = repr([version[field] for field in BOOKING_VERSION_FIELDS])
+    return '"%s"' % hashlib.md5(values.encode('utf-8')).hexdigest()
+
+
+def timeout_for(status, now):
+    seconds = BOOKING_TIMEOUTS.get(status)
+    if seconds is None:
+        return None
+    return now + timedelta(seconds=seconds)
+
+
+class MedicUnavailable(Exception):
+    pass
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def transition(bookings, target, notify=True, **fields):
+    """
+    Move every booking in the `bookings` queryset that may legally enter
+    `target` into it, together with any extra `fields`, using one guarded
+    UPDATE. Medics are released in the same transaction when their booking
+    stops holding them. Returns a BookingTransition per changed booking;
+    bookings in any other status are left untouched.
+    """
+    sources = TRANSITIONS[target]
+    now = timezone.now()
+    fields.setdefault('timeout_at', timeout_for(target, now))
+    with transaction.atomic():
+        rows = list(
+            bookings.select_for_update()
+            .filter(status__in=sources)
+            .values_list('id', 'medic_id', 'patient_id', 'status')
+        )
+        if not rows:
+            return []
+
+        Booking.objects.filter(id__in=[row[0] for row in rows], status__in=sources).update(
+            status=target, updated_at=now, **fields
+        )
+
+        released = set()
+        if target not in Booking.MEDIC_HOLD_STATUSES:
+            released = {medic_id for _, medic_id, _, source in rows if source in Booking.MEDIC_HOLD_STATUSES}
+        if released:
+            Medic.objects.filter(id__in=released).update(available=True, updated_at=now)
+
+        events = [BookingTransition(*row, target) for row in rows]
+        if notify:
+            transaction.on_commit(partial(notify_transitions, events))
+
+    if released:
+        # Availability changed through update(), which sends no signals
+        invalidate_search_cache()
+    return events
+
+
+def transition_booking(booking_id, target, notify=True, **fields):
+    events = transition(Booking.objects.filter(id=booking_id), target, notify=notify, **fields)
+    if not events:
+        raise InvalidTransition(f'Booking {booking_id} cannot move to {target}.')
+    return events[0]
+
+
+def cancel_medic_bookings(medic_id, notify=True):
+    return transition(Booking.objects.filter(medic_id=medic_id), 'cancelled', notify=notify)
+
+
+def generate_otp():
+    return str(random.randint(1000, 9999))
+
+
+def initiate_booking(patient, medic, latitude=None, longitude=None, notify=True):
+    """
+    Reserve `medic` for `patient` and create the booking in one transaction.
+    The reservation is a compare-and-set on Medic.available, so concurrent
+    requests for the same medic have exactly one winner; the others get
+    MedicUnavailable. Returns the booking and the transitions made.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # A new booking replaces any the patient still has open
+        events = transition(Booking.objects.filter(patient=patient), 'cancelled', notify=notify)
+
+        reserved = Medic.objects.filter(id=medic.id, available=True).update(available=False, updated_at=now)
+        if not reserved:
+            raise MedicUnavailable()
+
+        booking = Booking.objects.create(
+            patient=patient,
+            medic=medic,
+            status='initiated',
+            latitude=latitude,
+            longitude=longitude,
+            timeout_at=timeout_for('initiated', now),
+        )
+        event = BookingTransition(booking.id, medic.id, patient.id, None, 'initiated')
+        events.append(event)
+        if notify:
+            transaction.on_commit(partial(notify_transitions, [event]))
+
+    # Availability changed through update(), which sends no signals
+    invalidate_search_cache()
+    medic.available = False
+    return booking, events
+
+
+def share_location(booking, notify=True):
+    """
+    Move `booking` to location_shared with a fresh OTP and queue the OTP SMS
+    in the same transaction.
+    """
+    otp = generate_otp()
+    with transaction.atomic():
+        event = transition_booking(booking.id, 'location_shared', notify=notify, otp=otp)
+
+        # Queue the OTP for the patient's phone number alongside the status change
+        enqueue_sms(
+            booking.medic.phone_number,
+            f"Your booking has been confirmed, Please use this OTP {otp} once the provider arrives. Thank You! Nursera Team.",
+            idempotency_key=f'booking-{booking.id}-otp-{otp}',
+        )
+
+    booking.otp = otp
+    booking.status = 'location_shared'
+    return event
+
+
+def expire_overdue_bookings(batch_size=500, notify=True):
+    """
+    Cancel bookings whose timeout_at has passed, oldest first, in batches of
+    `batch_size`. Returns the transitions made.
+    """
+    # A configured status with no way into cancelled would be selected forever
+    statuses = [status for status in BOOKING_TIMEOUTS if status in TRANSITIONS['cancelled']]
+    events = []
+    while True:
+        overdue = list(
+            Booking.objects.filter(status__in=statuses, timeout_at__lte=timezone.now())
+            .order_by('timeout_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not overdue:
+            return events
+
+        cancelled = transition(Booking.objects.filter(id__in=overdue), 'cancelled', notify=notify)
+        events.extend(cancelled)
+        if len(overdue) < batch_size or not cancelled:
+            return events
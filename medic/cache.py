@@ -0,0 +1,95 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'MEDIC_SEARCH_CACHE_TIMEOUT', 300)
+
+# Query parameters that change a search-term response
+SEARCH_CACHE_PARAMS = ('search', 'limit', 'ordering', 'fields')
+
+VERSION_KEY = 'medic_search:version'
+HITS_KEY = 'medic_search:hits'
+MISSES_KEY = 'medic_search:misses'
+
+
+def get_search_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so an evicted counter never reuses old versions
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_search_cache():
+    """
+    Drop every cached search by moving to a new version; stale entries are
+    left to expire on their own.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_search_version()
+
+
+def search_cache_key(request):
+    """
+    Key for a search-term response. Nearest-medic searches return None: their
+    matches, order and cursors depend on the exact point, so only their
+    candidates are cached (see coverage_cache_key).
+    """
+    params = request.query_params
+    has_location = params.get('lat') is not None and params.get('lon') is not None
+    if has_location or not params.get('search'):
+        return None
+
+    parts = [request.get_host()] + [f'{name}={params.get(name)}' for name in SEARCH_CACHE_PARAMS]
+    digest = hashlib.md5('&'.join(parts).encode('utf-8')).hexdigest()
+    return f'medic_search:{get_search_version()}:{digest}'
+
+
+def coverage_cache_key(row, col):
+    """
+    Key for the medics whose coverage reaches grid cell (row, col). Every
+    search point in the cell shares them; coverage and distance are then
+    checked against the point itself.
+    """
+    return f'medic_search:{get_search_version()}:cell:{row}:{col}'
+
+
+def etag_matches(request, etag):
+    """
+    Whether the client's If-None-Match already names `etag`. Unlike Django's
+    conditional GET handling this also applies to the POST lookups.
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags or f'W/{etag}' in etags
+
+
+def increment_counter(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def record_hit():
+    increment_counter(HITS_KEY)
+
+
+def record_miss():
+    increment_counter(MISSES_KEY)
+
+
+def search_cache_stats():
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
@@ -0,0 +1,236 @@
+"""
+Channel layer backed by the application database, so every ASGI worker shares
+groups and messages without running a separate broker.
+"""
+import asyncio
+import json
+import logging
+import random
+import string
+import time
+import uuid
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import ChannelGroupMembership, ChannelMessage
+
+logger = logging.getLogger(__name__)
+
+def db_call(func):
+    # Layer queries run on the shared thread pool rather than the single
+    # thread-sensitive executor used by sync views
+    return database_sync_to_async(func, thread_sensitive=False)
+
+
+class DatabaseChannelLayer(BaseChannelLayer):
+    """
+    Messages for process-specific channels are tagged with the owning
+    process, which reads all of them with one indexed query per poll and hands
+    them to local queues. Group sends look members up once and write every
+    message in a single bulk insert.
+    """
+    extensions = ['groups', 'flush']
+
+    def __init__(
+        self,
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        poll_interval=0.05,
+        max_poll_interval=0.5,
+        batch_size=500,
+        cleanup_interval=30,
+        **kwargs,
+    ):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.batch_size = batch_size
+        self.cleanup_interval = cleanup_interval
+        self.client_prefix = uuid.uuid4().hex
+        self.receive_buffer = {}
+        self.poller = None
+        self.last_cleanup = 0
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        assert '__asgi_channel__' not in message
+
+        await db_call(self._send)(channel, message)
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel)
+        if '!' not in channel:
+            return await self.receive_single(channel)
+
+        queue = self.receive_buffer.setdefault(channel, asyncio.Queue())
+        self.ensure_poller()
+        try:
+            return await queue.get()
+        except asyncio.CancelledError:
+            # The consumer is gone; stop collecting its messages
+            self.receive_buffer.pop(channel, None)
+            raise
+
+    async def new_channel(self, prefix='specific.'):
+        suffix = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        return f'{prefix}{self.client_prefix}!{suffix}'
+
+    async def flush(self):
+        await db_call(self._flush)()
+        self.receive_buffer = {}
+
+    async def close(self):
+        if self.poller is not None:
+            self.poller.cancel()
+            self.poller = None
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), 'Group name not valid'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        await db_call(self._group_add)(group, channel)
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), 'Group name not valid'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        await db_call(self._group_discard)(group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        assert self.valid_group_name(group), 'Group name not valid'
+        await db_call(self._group_send)(group, message)
+
+    # Receiving
+
+    def ensure_poller(self):
+        # One poll loop per process and event loop feeds every local channel
+        loop = asyncio.get_running_loop()
+        if self.poller is None or self.poller.done() or self.poller.get_loop() is not loop:
+            self.poller = loop.create_task(self.poll())
+
+    async def poll(self):
+        interval = self.poll_interval
+        while self.receive_buffer:
+            processes = {self.process_name(channel) for channel in self.receive_buffer}
+            try:
+                rows = await db_call(self._claim)(processes)
+            except DatabaseError:
+                # Keep polling through transient errors such as a locked database
+                logger.exception("Channel layer poll failed")
+                rows = []
+            for channel, message in rows:
+                # Messages for channels that have stopped receiving are dropped
+                queue = self.receive_buffer.get(channel)
+                if queue is not None:
+                    queue.put_nowait(message)
+
+            if time.monotonic() - self.last_cleanup > self.cleanup_interval:
+                self.last_cleanup = time.monotonic()
+                try:
+                    await db_call(self._cleanup)()
+                except DatabaseError:
+                    logger.exception("Channel layer cleanup failed")
+
+            # Back off while idle, poll quickly again as soon as traffic arrives
+            if len(rows) >= self.batch_size:
+                continue
+            interval = self.poll_interval if rows else min(interval * 2, self.max_poll_interval)
+            await asyncio.sleep(interval)
+
+    async def receive_single(self, channel):
+        interval = self.poll_interval
+        while True:
+            try:
+                rows = await db_call(self._claim)([channel], limit=1)
+            except DatabaseError:
+                logger.exception("Channel layer poll failed")
+                rows = []
+            if rows:
+                return rows[0][1]
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+
+    # Database access
+
+    def process_name(self, channel):
+        # "specific.<client>!<suffix>" -> "specific.<client>!"
+        return self.non_local_name(channel)
+
+    def build_message(self, channel, message, expires_at):
+        return ChannelMessage(
+            channel=channel,
+            process=self.process_name(channel),
+            payload=json.dumps(message),
+            expires_at=expires_at,
+        )
+
+    def _send(self, channel, message):
+        now = timezone.now()
+        pending = ChannelMessage.objects.filter(process=self.process_name(channel), channel=channel, expires_at__gte=now)
+        if pending.count() >= self.get_capacity(channel):
+            raise ChannelFull(channel)
+        self.build_message(channel, message, now + timedelta(seconds=self.expiry)).save()
+
+    def _claim(self, processes, limit=None):
+        messages = ChannelMessage.objects.filter(process__in=processes, expires_at__gte=timezone.now())
+        # Most polls find nothing; don't open a write transaction for those
+        if not messages.exists():
+            return []
+        with transaction.atomic():
+            rows = list(
+                messages.select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'channel', 'payload')[:limit or self.batch_size]
+            )
+            if rows:
+                ChannelMessage.objects.filter(id__in=[row[0] for row in rows]).delete()
+        return [(channel, json.loads(payload)) for _, channel, payload in rows]
+
+    def _group_add(self, group, channel):
+        ChannelGroupMembership.objects.update_or_create(
+            group=group,
+            channel=channel,
+            defaults={'expires_at': timezone.now() + timedelta(seconds=self.group_expiry)},
+        )
+
+    def _group_discard(self, group, channel):
+        ChannelGroupMembership.objects.filter(group=group, channel=channel).delete()
+
+    def _group_send(self, group, message):
+        now = timezone.now()
+        channels = ChannelGroupMembership.objects.filter(group=group, expires_at__gte=now).values_list('channel', flat=True)
+        # Capacity isn't checked per member; undelivered messages simply expire
+        expires_at = now + timedelta(seconds=self.expiry)
+        ChannelMessage.objects.bulk_create(
+            [self.build_message(channel, message, expires_at) for channel in channels],
+            batch_size=self.batch_size,
+        )
+
+    def _cleanup(self):
+        """
+        Remove expired messages, and drop their channels from every group
+        since nobody has been reading them.
+        """
+        now = timezone.now()
+        expired = ChannelMessage.objects.filter(expires_at__lt=now)
+        stale_channels = set(expired.values_list('channel', flat=True))
+        expired.delete()
+        ChannelGroupMembership.objects.filter(expires_at__lt=now).delete()
+        if stale_channels:
+            ChannelGroupMembership.objects.filter(channel__in=stale_channels).delete()
+
+    def _flush(self):
+        ChannelMessage.objects.all().delete()
+        ChannelGroupMembership.objects.all().delete()
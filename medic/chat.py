@@ -0,0 +1,203 @@
+"""
+Booking chat storage: messages are buffered per process and written in
+batches, history is read with keyset cursors, and unread counts come from a
+per-user read marker.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ChatMessage, ChatReadMarker
+
+logger = logging.getLogger(__name__)
+
+# Buffered messages are written once this many are pending or this many
+# seconds after the first one arrived, whichever comes first
+FLUSH_SIZE = getattr(settings, 'CHAT_FLUSH_SIZE', 50)
+FLUSH_INTERVAL = getattr(settings, 'CHAT_FLUSH_INTERVAL', 0.5)
+# Messages kept for retry while the database is unavailable; the oldest are
+# dropped beyond this
+MAX_PENDING = getattr(settings, 'CHAT_MAX_PENDING', 10000)
+HISTORY_PAGE_SIZE = getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 30)
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def chat_group_name(booking_id):
+    return f'chat_{booking_id}'
+
+
+def message_data(message):
+    return {
+        'id': str(message.uuid),
+        'sender': message.sender_id,
+        'body': message.body,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def save_messages(messages):
+    """
+    Insert `messages` and return the ones to retry later. When the database
+    rejects the batch, rows are retried one at a time so that a bad row,
+    e.g. for a booking deleted meanwhile, is logged and dropped without
+    holding back the rest. Other errors propagate and the whole batch is
+    retried.
+    """
+    try:
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create(messages)
+        return []
+    except (IntegrityError, DataError):
+        pass
+
+    retry = []
+    for message in messages:
+        try:
+            with transaction.atomic():
+                ChatMessage.objects.bulk_create([message])
+        except (IntegrityError, DataError) as e:
+            logger.error(
+                f"Dropped chat message {message.uuid} for booking {message.booking_id} "
+                f"from user {message.sender_id}: {e}"
+            )
+        except Exception:
+            retry.append(message)
+    if retry:
+        logger.warning(f"Failed to save {len(retry)} chat message(s); retrying")
+    return retry
+
+
+class WriteBehindBuffer:
+    """
+    Collects chat messages from every connection in the process and saves
+    them with one bulk insert per flush.
+    """
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = []
+        self.timer = None
+        self.lock = asyncio.Lock()
+
+    async def add(self, message):
+        self.pending.append(message)
+        if len(self.pending) >= self.flush_size:
+            await self.flush()
+        else:
+            self.schedule_flush()
+
+    def schedule_flush(self):
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, lambda: asyncio.create_task(self.flush())
+            )
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        async with self.lock:
+            messages, self.pending = self.pending, []
+            if not messages:
+                return
+            try:
+                retry = await database_sync_to_async(save_messages)(messages)
+            except Exception:
+                logger.exception(f"Failed to save {len(messages)} chat message(s)")
+                retry = messages
+            if not retry:
+                return
+
+            # Keep what could not be saved, in order, for the next flush
+            self.pending[:0] = retry
+            overflow = len(self.pending) - self.max_pending
+            if overflow > 0:
+                logger.error(f"Dropped {overflow} unsaved chat message(s) over CHAT_MAX_PENDING")
+                del self.pending[:overflow]
+            self.schedule_flush()
+
+
+buffer = None
+
+
+def get_buffer():
+    # Created lazily so the lock binds to the serving event loop
+    global buffer
+    if buffer is None:
+        buffer = WriteBehindBuffer()
+    return buffer
+
+
+def new_message(booking_id, sender_id, body):
+    return ChatMessage(
+        booking_id=booking_id,
+        sender_id=sender_id,
+        uuid=uuid.uuid4(),
+        body=body,
+        created_at=timezone.now(),
+    )
+
+
+def encode_cursor(message):
+    key = [message.created_at.isoformat(), str(message.uuid)]
+    return urlsafe_b64encode(json.dumps(key).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, message_uuid = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+        created_at = parse_datetime(created_at)
+        message_uuid = uuid.UUID(message_uuid)
+    except (TypeError, ValueError, AttributeError):
+        raise InvalidCursor('Invalid cursor')
+    if created_at is None:
+        raise InvalidCursor('Invalid cursor')
+    return created_at, message_uuid
+
+
+@database_sync_to_async
+def load_history(booking_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    A page of messages, newest first, older than `cursor`, and the cursor
+    for the page after it (None at the start of the conversation).
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    messages = ChatMessage.objects.filter(booking_id=booking_id)
+    if cursor is not None:
+        created_at, message_uuid = decode_cursor(cursor)
+        messages = messages.filter(created_at__lte=created_at).exclude(
+            created_at=created_at, uuid__gte=message_uuid
+        )
+
+    page = list(messages.order_by('-created_at', '-uuid')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return [message_data(message) for message in page[:limit]], next_cursor
+
+
+@database_sync_to_async
+def unread_count(booking_id, user_id):
+    messages = ChatMessage.objects.filter(booking_id=booking_id).exclude(sender_id=user_id)
+    marker = ChatReadMarker.objects.filter(booking_id=booking_id, user_id=user_id).first()
+    if marker is not None:
+        messages = messages.filter(created_at__gt=marker.last_read_at)
+    return messages.count()
+
+
+@database_sync_to_async
+def mark_read(booking_id, user_id, read_at):
+    ChatReadMarker.objects.update_or_create(
+        booking_id=booking_id, user_id=user_id, defaults={'last_read_at': read_at}
+    )
@@ -1,32 +1,182 @@
 # my_app/consumers.py
+import asyncio
 import json
 import logging
-from channels.generic.websocket import AsyncWebsocketConsumer, WebsocketConsumer 
+import time
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import chat, locations
+from .models import Booking, Medic
+from .notifications import booking_group_name, medic_bookings_group_name, patient_bookings_group_name
+from .serializers import BookingListSerializer
 
 logger = logging.getLogger(__name__)
 
-class BookingConsumer(AsyncWebsocketConsumer):
+# Inbound client messages allowed per second, and the burst on top of that
+MESSAGE_RATE = getattr(settings, 'BOOKING_WS_MESSAGE_RATE', 2)
+MESSAGE_BURST = getattr(settings, 'BOOKING_WS_MESSAGE_BURST', 10)
+MAX_MESSAGE_LENGTH = getattr(settings, 'BOOKING_WS_MAX_MESSAGE_LENGTH', 1000)
+# Booking updates within this window go out as one frame
+COALESCE_SECONDS = getattr(settings, 'BOOKING_WS_COALESCE_SECONDS', 0.1)
+# Frames waiting to be written before a connection counts as too slow
+SEND_QUEUE_SIZE = getattr(settings, 'BOOKING_WS_SEND_QUEUE_SIZE', 64)
+
+# The medic's position is relayed at most once per interval, and written to
+# the booking at most once per persist interval
+LOCATION_INTERVAL = getattr(settings, 'BOOKING_LOCATION_INTERVAL', 1.0)
+LOCATION_PERSIST_INTERVAL = getattr(settings, 'BOOKING_LOCATION_PERSIST_INTERVAL', 30.0)
+LOCATION_FRAME_RATE = getattr(settings, 'BOOKING_LOCATION_FRAME_RATE', 10)
+LOCATION_FRAME_BURST = getattr(settings, 'BOOKING_LOCATION_FRAME_BURST', 20)
+# Booking states in which the medic streams their position
+LOCATION_STATUSES = ('location_shared', 'otp_sent', 'in_progress', 'confirmed')
+
+UNAUTHORIZED_CLOSE_CODE = 4403
+SLOW_CONSUMER_CLOSE_CODE = 4008
+RATE_LIMITED_CLOSE_CODE = 4029
+
+class TokenBucket:
+    """
+    Allows `rate` events per second on average with bursts of up to `burst`.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def consume(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+@database_sync_to_async
+def get_booking_for_user(user, booking_id):
+    """
+    The booking if `user` may follow it: its patient, its medic or staff.
+    """
+    if not user.is_authenticated:
+        return None
+    bookings = Booking.objects.filter(id=booking_id).select_related('medic').only(
+        'status', 'patient_id', 'medic__user_id', 'medic_latitude', 'medic_longitude'
+    )
+    if not user.is_staff:
+        bookings = bookings.filter(Q(patient=user) | Q(medic__user=user))
+    return bookings.first()
+
+
+@database_sync_to_async
+def save_medic_location(booking_id, position):
+    latitude, longitude = locations.from_micro(position)
+    Booking.objects.filter(id=booking_id).update(
+        medic_latitude=latitude,
+        medic_longitude=longitude,
+        medic_location_updated_at=timezone.now(),
+    )
+
+
+class BufferedWebsocketConsumer(AsyncWebsocketConsumer):
+    """
+    Writes outgoing frames from a bounded queue, closing connections that
+    fall too far behind instead of buffering without limit.
+    """
+    def start_writer(self):
+        self.outbox = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.writer = asyncio.create_task(self.write_frames())
+
+    def stop_writer(self):
+        self.writer.cancel()
+
+    def queue_frame(self, text_data=None, bytes_data=None):
+        try:
+            self.outbox.put_nowait((text_data, bytes_data))
+        except asyncio.QueueFull:
+            logger.warning(f"WebSocket send queue full on {self.channel_name}, closing")
+            asyncio.create_task(self.close(code=SLOW_CONSUMER_CLOSE_CODE))
+
+    def queue_json(self, data):
+        self.queue_frame(text_data=json.dumps(data))
+
+    async def write_frames(self):
+        while True:
+            text_data, bytes_data = await self.outbox.get()
+            await self.send(text_data=text_data, bytes_data=bytes_data)
+
+
+class BookingConsumer(BufferedWebsocketConsumer):
+    """
+    Live updates for one booking, open to its patient and medic only.
+
+    Updates arriving within one tick are coalesced into a single frame.
+
+    The medic may also stream their position as binary frames (see
+    medic.locations). It is relayed to the other side at a fixed interval,
+    delta-encoded per connection, and only the last known position is saved.
+    A frame that can't be decoded leaves the medic's delta base unknown, so
+    the server answers {"type": "location_resync"} and ignores deltas until
+    the next absolute frame.
+    """
     async def connect(self):
-        
         self.booking_id = self.scope['url_route']['kwargs'].get('booking_id')
-        self.booking_group_name = f'booking_{self.booking_id}'
+        self.user = self.scope.get('user')
+
+        booking = await get_booking_for_user(self.user, self.booking_id) if self.user is not None else None
+        if booking is None:
+            await self.close(code=UNAUTHORIZED_CLOSE_CODE)
+            return
+
+        self.booking_group_name = booking_group_name(self.booking_id)
+        self.booking_status = booking.status
+        self.is_medic = booking.medic.user_id == self.user.id
+        self.rate_limiter = TokenBucket(MESSAGE_RATE, MESSAGE_BURST)
+        self.pending_updates = []
+        self.flush_handle = None
+
+        # Location stream state
+        self.location_limiter = TokenBucket(LOCATION_FRAME_RATE, LOCATION_FRAME_BURST)
+        self.received_position = None
+        # Deltas are only accepted on top of an absolute frame
+        self.awaiting_keyframe = True
+        self.resync_requested = False
+        self.relayed_position = None
+        self.relay_handle = None
+        self.last_relayed_at = 0
+        self.persisted_position = None
+        self.last_persisted_at = time.monotonic()
+        self.sent_position = None
+        self.start_writer()
 
         # Join room group
         await self.channel_layer.group_add(
             self.booking_group_name,
             self.channel_name
         )
-
         await self.accept()
-        await self.send(text_data=json.dumps({
-            'message': f'WebSocket connection opened for booking {self.booking_id} on group {self.booking_group_name}.'
-        }))
-        
+
+        if booking.medic_latitude is not None and not self.is_medic:
+            self.send_position(locations.to_micro(booking.medic_latitude, booking.medic_longitude))
+
         logger.debug(f"WebSocket connection opened for booking {self.booking_id} on group {self.booking_group_name}")
 
     async def disconnect(self, close_code):
         # Ensure the group name is set
         if hasattr(self, 'booking_group_name'):
+            if self.flush_handle is not None:
+                self.flush_handle.cancel()
+            if self.relay_handle is not None:
+                self.relay_handle.cancel()
+            self.stop_writer()
+            if self.received_position != self.persisted_position:
+                await save_medic_location(self.booking_id, self.received_position)
             # Leave room group
             await self.channel_layer.group_discard(
                 self.booking_group_name,
@@ -34,36 +184,273 @@ class BookingConsumer(AsyncWebsocketConsumer):
             )
             logger.debug(f"WebSocket connection closed for booking {self.booking_id} with code {close_code}")
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
-        message = data['message']
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            await self.receive_location(bytes_data)
+            return
+
+        if not self.rate_limiter.consume():
+            logger.debug(f"WebSocket message dropped for booking {self.booking_id}: rate limited")
+            return
+
+        try:
+            message = json.loads(text_data)['message']
+        except (TypeError, ValueError, KeyError):
+            return
+        if not isinstance(message, str) or len(message) > MAX_MESSAGE_LENGTH:
+            return
         logger.debug(f"WebSocket message received for booking {self.booking_id}: {message}")
 
         # Send message to room group
-        if hasattr(self, 'booking_group_name'):
-            await self.channel_layer.group_send(
-                self.booking_group_name,
-                {
-                    'type': 'booking_update',
-                    'message': message
-                }
-            )
+        await self.channel_layer.group_send(
+            self.booking_group_name,
+            {
+                'type': 'booking_update',
+                'message': message
+            }
+        )
 
     async def booking_update(self, event):
+        logger.debug(f"WebSocket booking update for booking {self.booking_id}: {event['message']}")
+        if 'status' in event:
+            self.booking_status = event['status']
+
+        self.pending_updates.append(event['message'])
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(COALESCE_SECONDS, self.flush_updates)
+
+    def flush_updates(self):
+        messages, self.pending_updates = self.pending_updates, []
+        self.flush_handle = None
+
+        # A single update keeps the original {'message': ...} frame
+        frame = {'message': messages[-1]}
+        if len(messages) > 1:
+            frame['messages'] = messages
+        self.queue_json(frame)
+
+    async def receive_location(self, frame):
+        if not self.is_medic or self.booking_status not in LOCATION_STATUSES:
+            return
+        if not self.location_limiter.consume():
+            # Dropping frames would desync the sender's delta base, so a
+            # flooding client is disconnected instead
+            await self.close(code=RATE_LIMITED_CLOSE_CODE)
+            return
+        base = None if self.awaiting_keyframe else self.received_position
+        try:
+            self.received_position = locations.decode(frame, base)
+        except locations.InvalidFrame as e:
+            logger.debug(f"Location frame dropped for booking {self.booking_id}: {e}")
+            # The medic's next deltas would build on a position we never saw
+            self.awaiting_keyframe = True
+            if not self.resync_requested:
+                self.resync_requested = True
+                self.queue_json({'type': 'location_resync'})
+            return
+        self.awaiting_keyframe = False
+        self.resync_requested = False
+
+        # Downsample: only the newest position is relayed on each interval
+        if self.relay_handle is None:
+            delay = max(0, self.last_relayed_at + LOCATION_INTERVAL - time.monotonic())
+            self.relay_handle = asyncio.get_running_loop().call_later(
+                delay, lambda: asyncio.create_task(self.relay_location())
+            )
+
+        if time.monotonic() - self.last_persisted_at >= LOCATION_PERSIST_INTERVAL:
+            self.last_persisted_at = time.monotonic()
+            self.persisted_position = self.received_position
+            await save_medic_location(self.booking_id, self.received_position)
+
+    async def relay_location(self):
+        self.relay_handle = None
+        self.last_relayed_at = time.monotonic()
+        if self.received_position == self.relayed_position:
+            return
+        self.relayed_position = self.received_position
+        await self.channel_layer.group_send(
+            self.booking_group_name,
+            {
+                'type': 'location_update',
+                'position': list(self.received_position),
+                'sender': self.channel_name,
+            }
+        )
+
+    async def location_update(self, event):
+        if event['sender'] != self.channel_name:
+            self.send_position(tuple(event['position']))
+
+    def send_position(self, position):
+        if position == self.sent_position:
+            return
+        frame = locations.encode(position, self.sent_position)
+        self.sent_position = position
+        self.queue_frame(bytes_data=frame)
+
+
+class ChatConsumer(BufferedWebsocketConsumer):
+    """
+    Patient-medic chat for one booking.
+
+    Client frames are JSON objects with a `type`:
+      {"type": "message", "body": "..."}      send a message
+      {"type": "history", "cursor": "..."}    load older messages (newest first)
+      {"type": "read"}                        mark everything so far as read
+    The server pushes "message", "history" and "unread" frames back.
+    """
+    async def connect(self):
+        self.booking_id = self.scope['url_route']['kwargs'].get('booking_id')
+        self.user = self.scope.get('user')
+
+        booking = await get_booking_for_user(self.user, self.booking_id) if self.user is not None else None
+        if booking is None:
+            await self.close(code=UNAUTHORIZED_CLOSE_CODE)
+            return
+
+        self.chat_group_name = chat.chat_group_name(self.booking_id)
+        self.rate_limiter = TokenBucket(MESSAGE_RATE, MESSAGE_BURST)
+        self.start_writer()
+
+        await self.channel_layer.group_add(self.chat_group_name, self.channel_name)
+        await self.accept()
+
+        # Messages still buffered in this process count as unread too
+        await chat.get_buffer().flush()
+        self.unread = await chat.unread_count(self.booking_id, self.user.id)
+        self.queue_json({'type': 'unread', 'count': self.unread})
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'chat_group_name'):
+            self.stop_writer()
+            await chat.get_buffer().flush()
+            await self.channel_layer.group_discard(self.chat_group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if not self.rate_limiter.consume():
+            self.queue_json({'type': 'error', 'error': 'Rate limit exceeded.'})
+            return
+        try:
+            data = json.loads(text_data)
+            action = data['type']
+        except (TypeError, ValueError, KeyError):
+            return
+
+        if action == 'message':
+            await self.send_message(data.get('body'))
+        elif action == 'history':
+            await self.send_history(data.get('cursor'), data.get('limit'))
+        elif action == 'read':
+            await self.mark_read()
+
+    async def send_message(self, body):
+        if not isinstance(body, str) or not body.strip() or len(body) > MAX_MESSAGE_LENGTH:
+            self.queue_json({'type': 'error', 'error': 'Invalid message.'})
+            return
+
+        message = chat.new_message(self.booking_id, self.user.id, body)
+        # Delivered right away; the row is written with the next batch
+        await chat.get_buffer().add(message)
+        await self.channel_layer.group_send(
+            self.chat_group_name,
+            {'type': 'chat_message', 'message': chat.message_data(message)}
+        )
+
+    async def send_history(self, cursor, limit):
+        await chat.get_buffer().flush()
+        try:
+            limit = int(limit) if limit is not None else chat.HISTORY_PAGE_SIZE
+            messages, next_cursor = await chat.load_history(self.booking_id, cursor, limit)
+        except (TypeError, ValueError):
+            self.queue_json({'type': 'error', 'error': 'Invalid cursor.'})
+            return
+        self.queue_json({'type': 'history', 'messages': messages, 'next': next_cursor})
+
+    async def mark_read(self):
+        await chat.mark_read(self.booking_id, self.user.id, timezone.now())
+        self.unread = 0
+        self.queue_json({'type': 'unread', 'count': 0})
+
+    async def chat_message(self, event):
         message = event['message']
-        logger.debug(f"WebSocket booking update for booking {self.booking_id}: {message}")
-
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'message': message
-        }))
-
-class ChatConsumer(WebsocketConsumer):
-    
-    def connect(self): 
-        
-        self.accept()
-        self.send(text_data=json.dumps({
-            'type': 'connection_established',
-            'message': 'You are now connected.'
-        }))
\ No newline at end of file
+        self.queue_json({'type': 'message', 'message': message})
+        if message['sender'] != self.user.id:
+            self.unread += 1
+            self.queue_json({'type': 'unread', 'count': self.unread})
+
+
+class RecentBookingConsumer(BufferedWebsocketConsumer):
+    """
+    Push version of the recent patient/nurse booking endpoints: sends the
+    user's current active booking on connect, then only the fields that
+    change whenever the booking state machine moves it. Bookings use the
+    lean listing representation, which carries only public details of the
+    patient and medic.
+    """
+    async def connect(self):
+        self.role = self.scope['url_route']['kwargs'].get('role')
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=UNAUTHORIZED_CLOSE_CODE)
+            return
+
+        if self.role == 'patient':
+            groups = [patient_bookings_group_name(self.user.id)]
+        else:
+            medic_ids = Medic.objects.filter(user=self.user).values_list('id', flat=True)
+            groups = [medic_bookings_group_name(medic_id) async for medic_id in medic_ids]
+            if not groups:
+                await self.close(code=UNAUTHORIZED_CLOSE_CODE)
+                return
+
+        self.subscribed_groups = groups
+        self.current = None
+        self.refresh_handle = None
+        self.start_writer()
+        for group in groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+        self.current = await self.load_booking()
+        self.queue_json({'type': 'booking', 'booking': self.current})
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'subscribed_groups'):
+            if self.refresh_handle is not None:
+                self.refresh_handle.cancel()
+            self.stop_writer()
+            for group in self.subscribed_groups:
+                await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def load_booking(self):
+        bookings = BookingListSerializer.setup_eager_loading(
+            Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES)
+        )
+        if self.role == 'patient':
+            bookings = bookings.filter(patient=self.user)
+        else:
+            bookings = bookings.filter(medic__user=self.user)
+        booking = await bookings.order_by('-created_at').afirst()
+        return BookingListSerializer(booking).data if booking is not None else None
+
+    async def recent_booking_changed(self, event):
+        # A transition often comes in a burst (cancel old, create new), so
+        # reload once per tick
+        if self.refresh_handle is None:
+            self.refresh_handle = asyncio.get_running_loop().call_later(
+                COALESCE_SECONDS, lambda: asyncio.create_task(self.refresh())
+            )
+
+    async def refresh(self):
+        self.refresh_handle = None
+        previous, self.current = self.current, await self.load_booking()
+
+        if previous is None or self.current is None or previous['id'] != self.current['id']:
+            if previous != self.current:
+                self.queue_json({'type': 'booking', 'booking': self.current})
+            return
+
+        changes = {field: value for field, value in self.current.items() if previous.get(field) != value}
+        if changes:
+            self.queue_json({'type': 'delta', 'booking_id': self.current['id'], 'changes': changes})
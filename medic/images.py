@@ -0,0 +1,115 @@
+"""
+Resized WebP/JPEG variants of medic pictures.
+
+Variant files are named after a hash of their contents, so they never change
+once written and can be cached forever by browsers and CDNs.
+"""
+import hashlib
+import logging
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest side in pixels; images are never upscaled
+PICTURE_VARIANTS = getattr(settings, 'PICTURE_VARIANTS', {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1600,
+})
+
+# Extension -> (Pillow format, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANT_DIR = 'pictures/variants'
+HASH_LENGTH = 16
+
+VARIANT_NAME_RE = re.compile(r'/pictures/variants/[\w-]+-[0-9a-f]{%d}\.(webp|jpg)$' % HASH_LENGTH)
+
+
+def is_variant_url(url):
+    return bool(VARIANT_NAME_RE.search(url))
+
+
+def save_variant(image, name, extension, storage):
+    image_format, options = VARIANT_FORMATS[extension]
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    content = buffer.getvalue()
+
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    path = f'{VARIANT_DIR}/{name}-{digest}.{extension}'
+    # Identical content means an identical name, so existing files are reused
+    if not storage.exists(path):
+        path = storage.save(path, ContentFile(content))
+    return path
+
+
+def build_variants(picture, storage=default_storage):
+    """
+    Write every variant of the `picture` file and return the description
+    stored in Medic.picture_variants.
+    """
+    largest = max(PICTURE_VARIANTS.values())
+    with picture.open('rb'), Image.open(picture) as source:
+        # Let the JPEG decoder downscale while reading instead of decoding
+        # the full-resolution image
+        source.draft('RGB', (largest, largest))
+        source = ImageOps.exif_transpose(source)
+        if source.mode != 'RGB':
+            source = source.convert('RGB')
+
+        variants = {}
+        for name, size in PICTURE_VARIANTS.items():
+            image = source.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            variants[name] = {'width': image.width, 'height': image.height}
+            for extension in VARIANT_FORMATS:
+                variants[name][extension] = save_variant(image, name, extension, storage)
+
+    return {'source': picture.name, 'variants': variants}
+
+
+def update_picture_variants(medic):
+    """
+    Rebuild the variants of a medic whose picture changed since they were
+    last built. Returns whether anything was written.
+    """
+    if not medic.picture or medic.picture_variants.get('source') == medic.picture.name:
+        return False
+
+    try:
+        variants = build_variants(medic.picture)
+    except (OSError, ValueError):
+        logger.exception(f"Could not build picture variants for medic {medic.id}")
+        return False
+
+    medic.picture_variants = variants
+    # Bypass save() so the medic's signals don't run again
+    type(medic).objects.filter(id=medic.id).update(picture_variants=variants)
+    return True
+
+
+def variant_urls(medic, build_url=lambda url: url):
+    """
+    {variant: {'width', 'height', 'webp', 'jpg'}} with URLs passed through
+    `build_url`, or None when no variants exist.
+    """
+    variants = (medic.picture_variants or {}).get('variants')
+    if not variants:
+        return None
+    return {
+        name: {
+            key: build_url(default_storage.url(value)) if key in VARIANT_FORMATS else value
+            for key, value in variant.items()
+        }
+        for name, variant in variants.items()
+    }
@@ -0,0 +1,64 @@
+"""
+Binary frames for the live medic location stream.
+
+Positions travel as integer microdegrees (~0.1 m). A frame is either
+absolute (type byte + two int32, 9 bytes) or a delta from the previous
+position on the same connection (type byte + two int16, 5 bytes), which
+covers moves of up to ~3.6 km between frames. A sender starts with an
+absolute frame, and sends one again when the receiver asks for a resync.
+"""
+import struct
+
+ABSOLUTE = 1
+DELTA = 2
+
+ABSOLUTE_FORMAT = struct.Struct('<Bii')
+DELTA_FORMAT = struct.Struct('<Bhh')
+
+SCALE = 1_000_000
+INT16_RANGE = range(-32768, 32768)
+
+
+class InvalidFrame(ValueError):
+    pass
+
+
+def to_micro(latitude, longitude):
+    return round(latitude * SCALE), round(longitude * SCALE)
+
+
+def from_micro(position):
+    return position[0] / SCALE, position[1] / SCALE
+
+
+def encode(position, previous=None):
+    """
+    Encode a (lat, lon) microdegree position, as a delta from `previous`
+    when one is given and the move fits.
+    """
+    if previous is not None:
+        dlat, dlon = position[0] - previous[0], position[1] - previous[1]
+        if dlat in INT16_RANGE and dlon in INT16_RANGE:
+            return DELTA_FORMAT.pack(DELTA, dlat, dlon)
+    return ABSOLUTE_FORMAT.pack(ABSOLUTE, *position)
+
+
+def decode(frame, previous=None):
+    """
+    Return the microdegree position in `frame`; delta frames need the
+    previous position from the same sender.
+    """
+    try:
+        if frame[:1] == bytes([ABSOLUTE]):
+            _, lat, lon = ABSOLUTE_FORMAT.unpack(frame)
+        elif frame[:1] == bytes([DELTA]) and previous is not None:
+            _, dlat, dlon = DELTA_FORMAT.unpack(frame)
+            lat, lon = previous[0] + dlat, previous[1] + dlon
+        else:
+            raise InvalidFrame('Unknown frame type or delta without a base position.')
+    except struct.error:
+        raise InvalidFrame('Malformed location frame.')
+
+    if not (-90 * SCALE <= lat <= 90 * SCALE and -180 * SCALE <= lon <= 180 * SCALE):
+        raise InvalidFrame('Position out of range.')
+    return lat, lon
@@ -0,0 +1,20 @@
+"""
+Helpers shared by the bench_* management commands.
+"""
+from contextlib import contextmanager
+
+from django.test.utils import setup_databases, teardown_databases
+
+
+@contextmanager
+def test_databases(verbosity=0):
+    """
+    Point every database alias at a freshly created and migrated test
+    database for the duration of the block, then destroy it, so benchmark
+    rows never reach the configured databases.
+    """
+    old_config = setup_databases(verbosity, interactive=False, serialized_aliases=set())
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity)
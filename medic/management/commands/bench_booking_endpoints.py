@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+
+from medic.management.benchmarks import test_databases
+from medic.models import Booking, CustomUser, Location, Medic
+
+ENDPOINTS = {
+    'sync': '/api/bookings/recent/patient/',
+    'async': '/api/async/bookings/recent/patient/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second of the sync and async recent-booking endpoints through the '
+        'ASGI handler in this process. Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and concurrency level.')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50], help='Requests in flight at once.')
+
+    def handle(self, *args, **options):
+        with test_databases():
+            location = Location.objects.create(name='bench', latitude=28.6, longitude=77.2)
+            medic = Medic.objects.create(
+                name='bench', email='bench-medic@example.com', phone_number='1', description='', location=location,
+            )
+            patient = CustomUser.objects.create_user(email='bench-patient@example.com')
+            Booking.objects.create(patient=patient, medic=medic, status='confirmed')
+
+            self.stdout.write(f"{'response':>8} {'concurrency':>11} {'sync req/s':>11} {'async req/s':>12}")
+            # 304s skip the serializer and show the cost of the request path
+            for revalidate in (False, True):
+                for concurrency in options['concurrency']:
+                    rates = [
+                        asyncio.run(self.measure(url, options['requests'], concurrency, revalidate))
+                        for url in ENDPOINTS.values()
+                    ]
+                    label = '304' if revalidate else '200'
+                    self.stdout.write(f'{label:>8} {concurrency:>11} {rates[0]:>11.0f} {rates[1]:>12.0f}')
+
+    @staticmethod
+    async def measure(url, total, concurrency, revalidate):
+        client = AsyncClient()
+        data = {'email': 'bench-patient@example.com'}
+        # Also warms up connections and caches before timing
+        response = await client.post(url, data, content_type='application/json')
+        headers = {'If-None-Match': response['ETag']} if revalidate else {}
+        expected = 304 if revalidate else 200
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.post(url, data, content_type='application/json', headers=headers)
+                assert response.status_code == expected, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
@@ -0,0 +1,96 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection, connections
+
+from medic.bookings import initiate_booking
+from medic.management.benchmarks import test_databases
+from medic.models import Booking, CustomUser, Location, Medic
+
+# SQLite configurations to compare: engine and journal mode
+SQLITE_BACKENDS = {
+    'stock': ('django.db.backends.sqlite3', 'DELETE'),
+    'tuned': ('medic.backends.sqlite3', 'WAL'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent initiate_booking calls from several threads, each with its own connection, and report '
+        'committed bookings per second and failures. On SQLite the stock backend is compared with '
+        'medic.backends.sqlite3 (WAL, BEGIN IMMEDIATE). Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help='Concurrent writers.')
+        parser.add_argument('--bookings', type=int, default=25, help='Bookings each writer initiates.')
+
+    def handle(self, *args, **options):
+        with test_databases():
+            if connection.vendor == 'sqlite':
+                backends = SQLITE_BACKENDS
+            else:
+                backends = {connection.vendor: (connection.settings_dict['ENGINE'], None)}
+
+            self.stdout.write(f"{'backend':>8} {'threads':>7} {'bookings/s':>11} {'failed':>7}")
+            for label, (engine, journal_mode) in backends.items():
+                self.use_backend(engine, journal_mode)
+                for threads in options['threads']:
+                    rate, failed = self.measure(threads, options['bookings'])
+                    self.stdout.write(f'{label:>8} {threads:>7} {rate:>11.0f} {failed:>7}')
+
+    @staticmethod
+    def use_backend(engine, journal_mode):
+        # New connections, in every thread, are opened with this engine
+        connections.close_all()
+        connections.settings['default']['ENGINE'] = engine
+        if journal_mode is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+
+    @staticmethod
+    def measure(threads, bookings):
+        Booking.objects.all().delete()
+        location = Location.objects.create(name='bench', latitude=28.6, longitude=77.2)
+        run = uuid.uuid4().hex[:8]
+        writers = []
+        for i in range(threads):
+            patient = CustomUser.objects.create_user(email=f'bench-{run}-{i}@example.com')
+            medics = [
+                Medic.objects.create(
+                    name=f'bench {i} {j}', email=f'bench-{i}-{j}@example.com', phone_number='1', description='',
+                    location=location,
+                )
+                for j in range(bookings)
+            ]
+            writers.append((patient, medics))
+
+        start = threading.Barrier(threads + 1)
+        failures = []
+
+        def write(patient, medics):
+            start.wait()
+            try:
+                for medic in medics:
+                    # Each new booking also cancels the patient's previous one
+                    try:
+                        initiate_booking(patient, medic, notify=False)
+                    except DatabaseError as e:
+                        failures.append(e)
+            finally:
+                close_old_connections()
+
+        workers = [threading.Thread(target=write, args=writer) for writer in writers]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        began = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+
+        committed = Booking.objects.count()
+        assert committed + len(failures) == threads * bookings
+        return committed / elapsed, len(failures)
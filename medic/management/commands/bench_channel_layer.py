@@ -0,0 +1,52 @@
+import asyncio
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from medic.channel_layers import DatabaseChannelLayer
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure DatabaseChannelLayer throughput: group sends from one layer instance delivered to channels of '
+        'another, through the configured database. Each instance stands in for a separate worker process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000, help='Group sends per run.')
+        parser.add_argument('--members', type=int, nargs='+', default=[1, 10, 50], help='Group sizes to time.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'members':>7} {'sends/s':>8} {'deliveries/s':>13} {'seconds':>8}")
+        for members in options['members']:
+            elapsed = asyncio.run(self.measure(options['messages'], members))
+            sends = options['messages'] / elapsed
+            self.stdout.write(f'{members:>7} {sends:>8.0f} {sends * members:>13.0f} {elapsed:>8.2f}')
+
+    @staticmethod
+    async def measure(count, members):
+        sender = DatabaseChannelLayer()
+        receiver = DatabaseChannelLayer()
+        group = f'bench.{uuid.uuid4().hex}'
+        channels = [await receiver.new_channel() for _ in range(members)]
+        for channel in channels:
+            await receiver.group_add(group, channel)
+
+        async def send_all():
+            for i in range(count):
+                await sender.group_send(group, {'type': 'bench.message', 'n': i})
+
+        async def drain(channel):
+            for _ in range(count):
+                await receiver.receive(channel)
+
+        try:
+            start = time.perf_counter()
+            # Receivers start first so the poller is running while sends arrive
+            await asyncio.gather(*(drain(channel) for channel in channels), send_all())
+            return time.perf_counter() - start
+        finally:
+            for channel in channels:
+                await receiver.group_discard(group, channel)
+            await receiver.close()
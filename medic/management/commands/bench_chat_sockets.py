@@ -0,0 +1,64 @@
+import asyncio
+import gc
+import tracemalloc
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from medic.management.benchmarks import test_databases
+from medic.models import Booking, CustomUser, Location, Medic
+from medic.routing import websocket_urlpatterns
+
+
+class Command(BaseCommand):
+    help = (
+        'Open many idle chat sockets against ChatConsumer in this process and report the Python memory each one '
+        'holds (tracemalloc), including its channel layer queue. Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, nargs='+', default=[1000, 3000], help='Idle sockets to open.')
+
+    def handle(self, *args, **options):
+        with test_databases():
+            location = Location.objects.create(name='bench', latitude=28.6, longitude=77.2)
+            medic = Medic.objects.create(
+                name='bench', email='bench-medic@example.com', phone_number='1', description='', location=location,
+            )
+            patient = CustomUser.objects.create_user(email='bench-patient@example.com')
+            booking = Booking.objects.create(patient=patient, medic=medic, status='confirmed')
+
+            self.stdout.write(f"{'sockets':>8} {'total MiB':>10} {'KiB/socket':>11}")
+            for count in options['connections']:
+                used = asyncio.run(self.measure(count, patient, booking.id))
+                self.stdout.write(f'{count:>8} {used / 2 ** 20:>10.1f} {used / count / 1024:>11.1f}')
+
+    @staticmethod
+    async def measure(count, user, booking_id):
+        router = URLRouter(websocket_urlpatterns)
+
+        async def application(scope, receive, send):
+            return await router(dict(scope, user=user), receive, send)
+
+        async def connect():
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{booking_id}/')
+            connected, _ = await communicator.connect()
+            assert connected
+            # The unread count sent on connect
+            await communicator.receive_json_from()
+            return communicator
+
+        # Warm up imports, caches and the channel layer poller
+        warm = await connect()
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        communicators = [await connect() for _ in range(count)]
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        for communicator in [warm] + communicators:
+            await communicator.disconnect()
+        return used
@@ -0,0 +1,46 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from medic.utils import calculate_distance, coverage_mask
+
+
+class Command(BaseCommand):
+    help = 'Compare the batched coverage_mask with a per-medic calculate_distance loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Medic counts to time.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per size; the best is reported.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        lat, lon = 28.6, 77.2
+        self.stdout.write(f"{'medics':>8} {'scalar ms':>10} {'batched ms':>11} {'speedup':>8}")
+        for size in options['sizes']:
+            latitudes = [rng.uniform(8, 35) for _ in range(size)]
+            longitudes = [rng.uniform(68, 97) for _ in range(size)]
+            radii = [rng.uniform(1, 15) for _ in range(size)]
+
+            def scalar():
+                return [
+                    calculate_distance(lat, lon, medic_lat, medic_lon) <= radius
+                    for medic_lat, medic_lon, radius in zip(latitudes, longitudes, radii)
+                ]
+
+            def batched():
+                return coverage_mask(lat, lon, latitudes, longitudes, radii)[0]
+
+            assert scalar() == batched()
+            scalar_ms = self.best_of(scalar, options['repeat'])
+            batched_ms = self.best_of(batched, options['repeat'])
+            self.stdout.write(f'{size:>8} {scalar_ms:>10.2f} {batched_ms:>11.2f} {scalar_ms / batched_ms:>7.1f}x')
+
+    @staticmethod
+    def best_of(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
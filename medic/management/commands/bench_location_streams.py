@@ -0,0 +1,111 @@
+import asyncio
+import time
+import uuid
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from medic import consumers, locations
+from medic.management.benchmarks import test_databases
+from medic.models import Booking, CustomUser, Location, Medic
+from medic.routing import websocket_urlpatterns
+
+
+class Command(BaseCommand):
+    help = (
+        'Run many medic location streams through BookingConsumer in this process, each relayed to the '
+        "booking's patient, and report relayed frames per second against the expected rate and the event "
+        "loop's lag. Clients share the worker's event loop, so the figures are a lower bound. Runs against a "
+        'throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, nargs='+', default=[50, 200, 500], help='Concurrent streams.')
+        parser.add_argument('--rate', type=float, default=5, help='Frames per second each medic sends.')
+        parser.add_argument('--seconds', type=float, default=10, help='Duration of each run.')
+        parser.add_argument(
+            '--in-memory', action='store_true',
+            help='Use InMemoryChannelLayer instead of the configured layer, as a single-worker deployment would.',
+        )
+
+    def handle(self, *args, **options):
+        layers = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}} if options['in_memory'] else None
+        with test_databases(), override_settings(**({'CHANNEL_LAYERS': layers} if layers else {})):
+            self.stdout.write(
+                f"{'streams':>7} {'in/s':>7} {'relayed/s':>10} {'expected/s':>11} {'lag p50 ms':>11} {'lag max ms':>11}"
+            )
+            for streams in options['streams']:
+                pairs = self.create_bookings(streams)
+                sent, relayed, lags = asyncio.run(self.measure(pairs, options['rate'], options['seconds']))
+                lags.sort()
+                # The first position goes out at once, then one per interval
+                relay_rate = min(options['rate'], 1 / consumers.LOCATION_INTERVAL)
+                expected = streams * (1 + options['seconds'] * relay_rate) / options['seconds']
+                self.stdout.write(
+                    f'{streams:>7} {sent / options["seconds"]:>7.0f} {relayed / options["seconds"]:>10.0f} '
+                    f'{expected:>11.0f} {lags[len(lags) // 2] * 1000:>11.1f} {lags[-1] * 1000:>11.1f}'
+                )
+                Booking.objects.all().delete()
+
+    @staticmethod
+    def create_bookings(count):
+        location = Location.objects.create(name='bench', latitude=28.6, longitude=77.2)
+        run = uuid.uuid4().hex[:8]
+        pairs = []
+        for i in range(count):
+            nurse = CustomUser.objects.create_user(email=f'bench-nurse-{run}-{i}@example.com')
+            patient = CustomUser.objects.create_user(email=f'bench-patient-{run}-{i}@example.com')
+            medic = Medic.objects.create(
+                name=f'bench {i}', email=f'bench-{run}-{i}@example.com', phone_number='1', description='',
+                location=location, user=nurse,
+            )
+            booking = Booking.objects.create(patient=patient, medic=medic, status='confirmed')
+            pairs.append((booking.id, nurse, patient))
+        return pairs
+
+    @staticmethod
+    async def measure(pairs, rate, seconds):
+        router = URLRouter(websocket_urlpatterns)
+
+        def communicator(booking_id, user):
+            async def application(scope, receive, send):
+                return await router(dict(scope, user=user), receive, send)
+            return WebsocketCommunicator(application, f'/ws/booking/{booking_id}/')
+
+        connections = []
+        for booking_id, nurse, patient in pairs:
+            medic_socket, patient_socket = communicator(booking_id, nurse), communicator(booking_id, patient)
+            assert (await medic_socket.connect())[0] and (await patient_socket.connect())[0]
+            connections.append((medic_socket, patient_socket))
+
+        deadline = time.monotonic() + seconds
+        counts = {'sent': 0}
+        lags = []
+
+        async def stream(socket, index):
+            # A medic driving north-east, ~10 m per frame
+            previous = None
+            position = locations.to_micro(28.6 + index * 0.01, 77.2)
+            while time.monotonic() < deadline:
+                await socket.send_to(bytes_data=locations.encode(position, previous))
+                counts['sent'] += 1
+                previous, position = position, (position[0] + 90, position[1] + 90)
+                await asyncio.sleep(1 / rate)
+
+        async def watch_loop():
+            # How late a 10 ms sleep wakes up shows how busy the loop is
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                await asyncio.sleep(0.01)
+                lags.append(time.monotonic() - started - 0.01)
+
+        await asyncio.gather(watch_loop(), *(stream(medic_socket, i) for i, (medic_socket, _) in enumerate(connections)))
+        # Everything a patient received during the run is a relayed position
+        relayed = sum(patient_socket.output_queue.qsize() for _, patient_socket in connections)
+
+        for medic_socket, patient_socket in connections:
+            await medic_socket.disconnect()
+            await patient_socket.disconnect()
+        return counts['sent'], relayed, lags
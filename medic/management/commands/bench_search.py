@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from medic.models import Expertise, Location, Medic
+from medic.search import search_backend, search_medic_ids, write_documents
+
+FIRST_NAMES = ['Asha', 'Priya', 'Ravi', 'Sunita', 'Arjun', 'Meera', 'Kiran', 'Neha', 'Vikram', 'Anita']
+LAST_NAMES = ['Sharma', 'Patel', 'Singh', 'Iyer', 'Reddy', 'Gupta', 'Nair', 'Das', 'Mehta', 'Khan']
+EXPERTISE = ['Wound Care', 'Elderly Care', 'Physiotherapy', 'Injections', 'Post Surgery', 'Pediatrics']
+QUERIES = ['pri', 'priya sharma', 'wound', 'physio', 'khan', 'zubair']
+
+# Matches the list view's limit on search results
+RESULT_LIMIT = 50
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare medic search latency of the full-text index with the old icontains query. '
+        'Sample medics are created in a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Medic counts to time.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the best is reported.')
+
+    def handle(self, *args, **options):
+        if search_backend(connection) is None:
+            self.stderr.write(f'No full-text search on {connection.vendor}.')
+            return
+
+        self.stdout.write(f"{'medics':>8} {'query':<14} {'icontains ms':>13} {'index ms':>9}")
+        for size in options['sizes']:
+            with transaction.atomic():
+                self.create_medics(size)
+                for query in QUERIES:
+                    icontains_ms = self.best_of(lambda: self.icontains_ids(query), options['repeat'])
+                    index_ms = self.best_of(lambda: search_medic_ids(query, RESULT_LIMIT), options['repeat'])
+                    self.stdout.write(f'{size:>8} {query:<14} {icontains_ms:>13.2f} {index_ms:>9.2f}')
+                transaction.set_rollback(True)
+
+    @staticmethod
+    def icontains_ids(query):
+        # The search branch of the list view before the full-text index
+        return list(Medic.objects.filter(
+            Q(name__icontains=query) | Q(email__icontains=query) | Q(expertise__name__icontains=query)
+        ).distinct().values_list('id', flat=True)[:RESULT_LIMIT])
+
+    @staticmethod
+    def create_medics(size):
+        rng = random.Random(size)
+        expertise = [Expertise.objects.create(name=name) for name in EXPERTISE]
+        location = Location.objects.create(name='bench', latitude=28.6, longitude=77.2)
+
+        medics = []
+        for i in range(size):
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            medics.append(Medic(
+                name=name,
+                email=f"{name.replace(' ', '.').lower()}{i}@example.com",
+                phone_number='1',
+                description='Home visits for patients across the city.',
+                location=location,
+            ))
+        # bulk_create skips the signals, so the index is written directly
+        medics = Medic.objects.bulk_create(medics, batch_size=1000)
+
+        Through = Medic.expertise.through
+        assigned = {medic.id: rng.sample(expertise, 2) for medic in medics}
+        Through.objects.bulk_create([
+            Through(medic_id=medic_id, expertise_id=item.id) for medic_id, items in assigned.items() for item in items
+        ], batch_size=1000)
+        write_documents(connection, [
+            (medic.id, medic.name, medic.description, ' '.join(item.name for item in assigned[medic.id]), medic.email)
+            for medic in medics
+        ])
+
+    @staticmethod
+    def best_of(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
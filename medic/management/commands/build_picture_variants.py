@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from medic.images import update_picture_variants
+from medic.models import Medic
+
+
+class Command(BaseCommand):
+    help = 'Build resized picture variants for medics that are missing them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that already exist.')
+
+    def handle(self, *args, **options):
+        built = 0
+        for medic in Medic.objects.exclude(picture='').only('id', 'picture', 'picture_variants').iterator():
+            if options['force']:
+                medic.picture_variants = {}
+            if update_picture_variants(medic):
+                built += 1
+        self.stdout.write(f'Built variants for {built} medic(s).')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from medic.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued SMS messages from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages claimed per batch.')
+        parser.add_argument('--loop', action='store_true', help='Keep delivering until interrupted.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            attempted = deliver_pending(batch_size=options['batch_size'])
+            if attempted or not options['loop']:
+                self.stdout.write(f'Attempted {attempted} message(s).')
+            if not options['loop']:
+                return
+            if attempted < options['batch_size']:
+                time.sleep(options['interval'])
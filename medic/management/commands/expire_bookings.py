@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from medic.bookings import expire_overdue_bookings
+
+
+class Command(BaseCommand):
+    help = 'Cancel bookings whose timeout_at has passed and release their medics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Bookings expired per UPDATE.')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping until interrupted.')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between sweeps with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            events = expire_overdue_bookings(batch_size=options['batch_size'])
+            if events or not options['loop']:
+                self.stdout.write(f'Expired {len(events)} booking(s).')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from medic.uploads import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete expired, unfinished upload sessions and their partial files.'
+
+    def handle(self, *args, **options):
+        purged = purge_expired_uploads()
+        self.stdout.write(f'Purged {purged} upload(s).')
@@ -0,0 +1,51 @@
+"""
+Serving of uploaded media files through WhiteNoise.
+"""
+import os
+
+from django.conf import settings
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .images import is_variant_url
+
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 60 * 60)
+# The only part of MEDIA_ROOT that is public. Identity documents and anything
+# else uploaded stay private (see views.identity_document)
+PUBLIC_MEDIA_DIR = 'pictures/'
+
+
+class MediaFilesMiddleware(WhiteNoise):
+    """
+    Serves medic pictures under MEDIA_ROOT/PUBLIC_MEDIA_DIR, in every
+    environment, with WhiteNoise's responses (ETag, Last-Modified,
+    Range requests, HEAD) instead of Django's static() view. Content-hashed
+    picture variants are marked immutable and cached for a year; original
+    pictures get MEDIA_MAX_AGE.
+
+    Uploads appear while the server runs, so files are looked up on
+    request rather than indexed at startup; variants, whose contents never
+    change, are remembered after the first lookup.
+    """
+    # Django response wrapping, shared with the static files middleware
+    serve = staticmethod(WhiteNoiseMiddleware.serve)
+
+    def __init__(self, get_response=None, settings=settings):
+        self.get_response = get_response
+        super().__init__(application=None, autorefresh=True, max_age=MEDIA_MAX_AGE)
+        self.media_prefix = settings.MEDIA_URL + PUBLIC_MEDIA_DIR
+        self.add_files(os.path.join(settings.MEDIA_ROOT, PUBLIC_MEDIA_DIR), prefix=self.media_prefix)
+
+    def __call__(self, request):
+        url = request.path_info
+        static_file = self.files.get(url)
+        if static_file is None and url.startswith(self.media_prefix):
+            static_file = self.find_file(url)
+            if static_file is not None and is_variant_url(url):
+                self.files[url] = static_file
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return self.get_response(request)
+
+    def immutable_file_test(self, path, url):
+        return is_variant_url(url)
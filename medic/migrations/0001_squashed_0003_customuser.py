@@ -0,0 +1,155 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    """
+    0001 gives Review.default_user a foreign key to CustomUser, which 0003
+    only creates, so an empty database cannot be migrated through them.
+    New databases use this migration instead, which creates CustomUser
+    before the foreign key; databases that already applied 0001-0003 keep
+    their history.
+    """
+
+    replaces = [
+        ('medic', '0001_initial'),
+        ('medic', '0002_socialauthdata_created_at_socialauthdata_updated_at'),
+        ('medic', '0003_customuser'),
+    ]
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Expertise',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Feedback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Medic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('picture', models.ImageField(upload_to='pictures/')),
+                ('email', models.EmailField(max_length=254)),
+                ('description', models.TextField()),
+                ('phone_number', models.CharField(max_length=20)),
+                ('verified', models.BooleanField(default=False)),
+                ('available', models.BooleanField(default=True)),
+                ('area_coverage_km', models.FloatField(blank=True, help_text='Coverage radius in kilometers', null=True)),
+                ('extra_fields', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('expertise', models.ManyToManyField(related_name='medic_items', to='medic.expertise')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medic_items', to='medic.location')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SocialAuthData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=255)),
+                ('provider', models.CharField(max_length=50)),
+                ('email', models.EmailField(max_length=254)),
+                ('name', models.CharField(max_length=100)),
+                ('picture', models.URLField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Review',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('status', models.CharField(choices=[('active', 'Active'), ('pending', 'Pending')], default='pending', max_length=10)),
+                ('rating', models.FloatField()),
+                ('extra_fields', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_items', to='medic.medic')),
+                ('social_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='medic.socialauthdata')),
+                ('tags', models.ManyToManyField(blank=True, to='medic.tag')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IdentityVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.ImageField(upload_to='identity_verification/')),
+                ('verified', models.BooleanField(default=False)),
+                ('verified_at', models.DateTimeField(blank=True, null=True)),
+                ('extra_fields', models.JSONField(blank=True, null=True)),
+                ('medic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='identity_verification', to='medic.medic')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='socialauthdata',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='socialauthdata',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='email address')),
+                ('first_name', models.CharField(blank=True, max_length=30, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=30, verbose_name='last name')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('is_staff', models.BooleanField(default=False, verbose_name='staff status')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='customuser_set', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='customuser_set', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='default_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:35
+
+from math import floor
+
+from django.db import migrations, models
+
+
+GRID_CELL_DEGREES = 0.1
+
+
+def backfill_grid_cells(apps, schema_editor):
+    Location = apps.get_model('medic', 'Location')
+    for location in Location.objects.all().iterator():
+        location.grid_row = floor(location.latitude / GRID_CELL_DEGREES)
+        location.grid_col = floor(location.longitude / GRID_CELL_DEGREES)
+        location.save(update_fields=['grid_row', 'grid_col'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0009_booking_latitude_booking_longitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='grid_col',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='grid_row',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('initiated', 'Initiated'), ('location_shared', 'Location Shared'), ('otp_sent', 'OTP Sent'), ('in_progress', 'In Progress'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='initiated', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='medic',
+            name='area_coverage_km',
+            field=models.FloatField(blank=True, db_index=True, help_text='Coverage radius in kilometers', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['grid_row', 'grid_col'], name='location_grid_idx'),
+        ),
+        migrations.RunPython(backfill_grid_cells, migrations.RunPython.noop),
+    ]
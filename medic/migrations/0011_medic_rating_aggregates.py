@@ -0,0 +1,46 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:37
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Medic = apps.get_model('medic', 'Medic')
+    Review = apps.get_model('medic', 'Review')
+    totals = (
+        Review.objects.filter(status='active')
+        .values('medic_id')
+        .annotate(review_count=Count('id'), rating_sum=Sum('rating'))
+    )
+    for row in totals:
+        Medic.objects.filter(pk=row['medic_id']).update(
+            review_count=row['review_count'],
+            rating_sum=row['rating_sum'],
+            rating_avg=row['rating_sum'] / row['review_count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0010_location_grid_cells'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medic',
+            name='rating_avg',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='medic',
+            name='rating_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='medic',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
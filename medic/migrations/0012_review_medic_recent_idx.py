@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0011_medic_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['medic', 'status', '-created_at'], name='review_medic_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# The search index as of this migration, kept inline so later changes to
+# medic.search don't alter what it does
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS medic_medic_fts USING fts5("
+    "name, description, expertise, email, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+SQLITE_BACKFILL = (
+    "INSERT INTO medic_medic_fts (rowid, name, description, expertise, email) "
+    "SELECT m.id, m.name, COALESCE(m.description, ''), "
+    "COALESCE((SELECT group_concat(e.name, ' ') FROM medic_medic_expertise me "
+    "JOIN medic_expertise e ON e.id = me.expertise_id WHERE me.medic_id = m.id), ''), "
+    "COALESCE(m.email, '') "
+    "FROM medic_medic m"
+)
+SQLITE_DROP = "DROP TABLE IF EXISTS medic_medic_fts"
+
+POSTGRES_CREATE = (
+    "CREATE TABLE IF NOT EXISTS medic_medic_search ("
+    "medic_id bigint PRIMARY KEY REFERENCES medic_medic(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS medic_medic_search_document_idx "
+    "ON medic_medic_search USING GIN (document)",
+)
+POSTGRES_BACKFILL = (
+    "INSERT INTO medic_medic_search (medic_id, document) "
+    "SELECT m.id, "
+    "setweight(to_tsvector('simple', m.name), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE(m.description, '')), 'D') || "
+    "setweight(to_tsvector('simple', COALESCE((SELECT string_agg(e.name, ' ') FROM medic_medic_expertise me "
+    "JOIN medic_expertise e ON e.id = me.expertise_id WHERE me.medic_id = m.id), '')), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(m.email, '')), 'C') "
+    "FROM medic_medic m "
+    "ON CONFLICT (medic_id) DO UPDATE SET document = EXCLUDED.document"
+)
+POSTGRES_DROP = "DROP TABLE IF EXISTS medic_medic_search"
+
+
+def build_search_index(apps, schema_editor):
+    # Other databases fall back to icontains searches and get no index
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = (SQLITE_CREATE, SQLITE_BACKFILL)
+    elif vendor == 'postgresql':
+        statements = POSTGRES_CREATE + (POSTGRES_BACKFILL,)
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_DROP)
+    elif vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0012_review_medic_recent_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, remove_search_index),
+    ]
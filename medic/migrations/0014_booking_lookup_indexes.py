@@ -0,0 +1,52 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+ACTIVE_STATUSES = ['initiated', 'location_shared', 'in_progress', 'confirmed']
+MEDIC_HOLD_STATUSES = ['initiated', 'location_shared', 'otp_sent', 'in_progress']
+
+
+def cancel_extra_active_bookings(apps, schema_editor):
+    # Keep only each patient's most recent active booking so the
+    # constraint below can be created
+    Booking = apps.get_model('medic', 'Booking')
+    Medic = apps.get_model('medic', 'Medic')
+    active = Booking.objects.filter(status__in=ACTIVE_STATUSES).order_by('patient_id', '-created_at', '-id')
+    seen = set()
+    extras = []
+    held = set()
+    for booking_id, patient_id, medic_id, status in active.values_list('id', 'patient_id', 'medic_id', 'status'):
+        if patient_id in seen:
+            extras.append(booking_id)
+            if status in MEDIC_HOLD_STATUSES:
+                held.add(medic_id)
+        seen.add(patient_id)
+    Booking.objects.filter(id__in=extras).update(status='cancelled')
+
+    # Medics held only by the cancelled bookings are free again
+    still_held = Booking.objects.filter(medic_id__in=held, status__in=MEDIC_HOLD_STATUSES).values_list('medic_id', flat=True)
+    Medic.objects.filter(id__in=held - set(still_held)).update(available=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0013_medic_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_extra_active_bookings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['patient', 'status', '-created_at'], name='booking_patient_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['medic', 'status', '-created_at'], name='booking_medic_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['initiated', 'location_shared', 'in_progress', 'confirmed'])), fields=('patient',), name='unique_active_booking_per_patient'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0014_booking_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'timeout_at'], name='booking_timeout_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0015_booking_timeout_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundSms',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('body', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claim_token', models.CharField(blank=True, max_length=32)),
+                ('provider_message_id', models.CharField(blank=True, max_length=64)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbound_sms_due_idx')],
+            },
+        ),
+    ]
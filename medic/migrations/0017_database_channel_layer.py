@@ -0,0 +1,39 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0016_outbound_sms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelGroupMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.CharField(max_length=100)),
+                ('channel', models.CharField(max_length=100)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChannelMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=100)),
+                ('process', models.CharField(max_length=100)),
+                ('payload', models.TextField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['process', 'id'], name='channel_message_process_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='channelgroupmembership',
+            constraint=models.UniqueConstraint(fields=('group', 'channel'), name='unique_channel_group_membership'),
+        ),
+    ]
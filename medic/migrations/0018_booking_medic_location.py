@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0017_database_channel_layer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='medic_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='medic_location_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='medic_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0019_chat_messages'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['-created_at'], name='booking_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', '-created_at'], name='booking_status_recent_idx'),
+        ),
+    ]
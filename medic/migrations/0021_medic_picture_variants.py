@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0020_booking_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medic',
+            name='picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0021_medic_picture_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('purpose', models.CharField(choices=[('medic_picture', 'Medic Picture'), ('identity_document', 'Identity Document')], max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.PositiveBigIntegerField()),
+                ('received_size', models.PositiveBigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='uploading', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('result', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('medic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='medic.medic')),
+            ],
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:15
+
+from math import cos, floor, radians
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Grid geometry as of this migration, so later changes to medic.utils
+# don't alter it
+GRID_CELL_DEGREES = 0.1
+MAX_COVERAGE_CELLS = 10000
+WHOLE_ROW = 999999
+
+
+def grid_cell(lat, lon):
+    return floor(lat / GRID_CELL_DEGREES), floor(lon / GRID_CELL_DEGREES)
+
+
+def coverage_cells(lat, lon, radius_km):
+    dlat = radius_km / 111.0
+    min_lat, max_lat = lat - dlat, lat + dlat
+    rows = range(grid_cell(min_lat, lon)[0], grid_cell(max_lat, lon)[0] + 1)
+
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest < 89.0:
+        dlon = radius_km / (111.0 * cos(radians(widest)))
+        min_lon, max_lon = lon - dlon, lon + dlon
+        if min_lon >= -180.0 and max_lon <= 180.0:
+            cols = range(grid_cell(lat, min_lon)[1], grid_cell(lat, max_lon)[1] + 1)
+            if len(rows) * len(cols) <= MAX_COVERAGE_CELLS:
+                return [(row, col) for row in rows for col in cols]
+    return [(row, WHOLE_ROW) for row in rows]
+
+
+def backfill_coverage_cells(apps, schema_editor):
+    Medic = apps.get_model('medic', 'Medic')
+    CoverageCell = apps.get_model('medic', 'CoverageCell')
+    medics = Medic.objects.filter(area_coverage_km__isnull=False).select_related('location')
+    for medic in medics.iterator(chunk_size=500):
+        CoverageCell.objects.bulk_create([
+            CoverageCell(medic_id=medic.id, grid_row=row, grid_col=col)
+            for row, col in coverage_cells(medic.location.latitude, medic.location.longitude, medic.area_coverage_km)
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0022_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grid_row', models.IntegerField()),
+                ('grid_col', models.IntegerField()),
+                ('medic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coverage_cells', to='medic.medic')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['grid_row', 'grid_col'], name='coverage_cell_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_coverage_cells, migrations.RunPython.noop),
+    ]
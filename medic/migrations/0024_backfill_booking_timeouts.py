@@ -0,0 +1,36 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:20
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import F
+
+
+# Booking timeouts in seconds as of this migration
+BOOKING_TIMEOUTS = {
+    'initiated': 15 * 60,
+    'location_shared': 2 * 60 * 60,
+}
+
+
+def backfill_booking_timeouts(apps, schema_editor):
+    # Bookings opened before timeout_at was set on every transition have
+    # none, so the sweeper could never expire them. Their last update is
+    # the best record of when they entered their status; ones already
+    # overdue are cancelled on the next sweep
+    Booking = apps.get_model('medic', 'Booking')
+    for status, seconds in BOOKING_TIMEOUTS.items():
+        Booking.objects.filter(status=status, timeout_at__isnull=True).update(
+            timeout_at=F('updated_at') + timedelta(seconds=seconds)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0023_medic_coverage_cells'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_booking_timeouts, migrations.RunPython.noop),
+    ]
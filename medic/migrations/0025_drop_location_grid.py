@@ -0,0 +1,30 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medic', '0024_backfill_booking_timeouts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='location',
+            name='location_grid_idx',
+        ),
+        migrations.RemoveField(
+            model_name='location',
+            name='grid_col',
+        ),
+        migrations.RemoveField(
+            model_name='location',
+            name='grid_row',
+        ),
+        migrations.AlterField(
+            model_name='medic',
+            name='area_coverage_km',
+            field=models.FloatField(blank=True, help_text='Coverage radius in kilometers', null=True),
+        ),
+    ]
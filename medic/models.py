@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, Group, Permission  
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+import uuid
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -80,6 +81,8 @@ class Medic(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(CustomUser, related_name='medic', on_delete=models.CASCADE, null=True, blank=True)
     picture = models.ImageField(upload_to='pictures/')
+    # Resized copies of picture, built by medic.images
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     email = models.EmailField()
     phone_number = models.CharField(max_length=20)
     description = models.TextField()
@@ -90,12 +93,30 @@ class Medic(models.Model):
     available = models.BooleanField(default=True)
     area_coverage_km = models.FloatField(blank=True, null=True, help_text="Coverage radius in kilometers")
     extra_fields = models.JSONField(blank=True, null=True)
+    # Aggregates over active reviews, maintained by medic.signals
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0)
+    rating_avg = models.FloatField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+class CoverageCell(models.Model):
+    """
+    A grid cell reached by a medic's coverage area, kept in sync by
+    medic.signals. A grid_col of utils.WHOLE_ROW covers the whole row.
+    """
+    medic = models.ForeignKey(Medic, related_name='coverage_cells', on_delete=models.CASCADE)
+    grid_row = models.IntegerField()
+    grid_col = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['grid_row', 'grid_col'], name='coverage_cell_idx'),
+        ]
+
 class Review(models.Model):
     STATUS_CHOICES = (
         ('active', 'Active'),
@@ -113,6 +134,11 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['medic', 'status', '-created_at'], name='review_medic_recent_idx'),
+        ]
+
     def __str__(self):
         return f"Review by {self.medic.name} for Medic: {self.medic.name}"
 
@@ -147,6 +173,11 @@ class Feedback(models.Model):
     def __str__(self):
         return f"Feedback from {self.user.username if self.user else 'Anonymous'}"
 
+# A patient can hold at most one booking in these states
+ACTIVE_BOOKING_STATUSES = ['initiated', 'location_shared', 'in_progress', 'confirmed']
+# The booked medic stays unavailable while a booking is in these states
+MEDIC_HOLD_STATUSES = ['initiated', 'location_shared', 'otp_sent', 'in_progress']
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('initiated', 'Initiated'),
@@ -157,6 +188,8 @@ class Booking(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    ACTIVE_STATUSES = ACTIVE_BOOKING_STATUSES
+    MEDIC_HOLD_STATUSES = MEDIC_HOLD_STATUSES
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='initiated')
     patient = models.ForeignKey(CustomUser, related_name='patient_bookings', on_delete=models.CASCADE)
@@ -169,6 +202,145 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)    
     timeout_at = models.DateTimeField(null=True, blank=True)
+    # Last position streamed by the medic; latitude/longitude is the patient's
+    medic_latitude = models.FloatField(blank=True, null=True)
+    medic_longitude = models.FloatField(blank=True, null=True)
+    medic_location_updated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'status', '-created_at'], name='booking_patient_recent_idx'),
+            models.Index(fields=['medic', 'status', '-created_at'], name='booking_medic_recent_idx'),
+            models.Index(fields=['status', 'timeout_at'], name='booking_timeout_idx'),
+            models.Index(fields=['-created_at'], name='booking_recent_idx'),
+            models.Index(fields=['status', '-created_at'], name='booking_status_recent_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['patient'],
+                condition=models.Q(status__in=ACTIVE_BOOKING_STATUSES),
+                name='unique_active_booking_per_patient',
+            ),
+        ]
 
     def __str__(self):
         return f"Booking from {self.patient.email} to {self.medic.name} ({self.medic.email})"
+
+
+class OutboundSms(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    # Enqueueing the same key twice yields a single message
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    phone_number = models.CharField(max_length=20)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    provider_message_id = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_sms_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"SMS to {self.phone_number} ({self.status})"
+
+
+class ChannelMessage(models.Model):
+    # Queued message for medic.channel_layers.DatabaseChannelLayer
+    channel = models.CharField(max_length=100)
+    # Process prefix of specific channels ("...!"), or the full channel name
+    process = models.CharField(max_length=100)
+    payload = models.TextField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['process', 'id'], name='channel_message_process_idx'),
+        ]
+
+
+class ChannelGroupMembership(models.Model):
+    group = models.CharField(max_length=100)
+    channel = models.CharField(max_length=100)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'channel'], name='unique_channel_group_membership'),
+        ]
+
+
+class ChatMessage(models.Model):
+    booking = models.ForeignKey(Booking, related_name='chat_messages', on_delete=models.CASCADE)
+    sender = models.ForeignKey(CustomUser, related_name='chat_messages', on_delete=models.CASCADE)
+    # Assigned when the message arrives, as rows are written in batches later
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    body = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['booking', '-created_at', '-uuid'], name='chat_message_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message from {self.sender_id} on booking {self.booking_id}"
+
+
+class ChatReadMarker(models.Model):
+    # Messages in the booking created after last_read_at are unread for user
+    booking = models.ForeignKey(Booking, related_name='chat_read_markers', on_delete=models.CASCADE)
+    user = models.ForeignKey(CustomUser, related_name='chat_read_markers', on_delete=models.CASCADE)
+    last_read_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['booking', 'user'], name='unique_chat_read_marker'),
+        ]
+
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload of a medic picture or identity document.
+    """
+    PURPOSE_CHOICES = [
+        ('medic_picture', 'Medic Picture'),
+        ('identity_document', 'Identity Document'),
+    ]
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    # Random so the session URL doubles as the upload credential
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    medic = models.ForeignKey(Medic, related_name='upload_sessions', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    received_size = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    error = models.TextField(blank=True)
+    # Storage name of the processed file
+    result = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.purpose}, {self.status})"
@@ -0,0 +1,63 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+# Text pushed to the booking's group when it enters each status
+TRANSITION_MESSAGES = {
+    'initiated': 'Booking initiated.',
+    'location_shared': 'Location shared by patient',
+    'otp_sent': 'OTP sent.',
+    'in_progress': 'Booking in progress.',
+    'confirmed': 'Booking confirmed and completed.',
+    'completed': 'Booking completed.',
+    'cancelled': 'Booking cancelled.',
+}
+
+
+def booking_group_name(booking_id):
+    return f'booking_{booking_id}'
+
+
+# Subscribers to a user's current booking, as patient or as medic
+def patient_bookings_group_name(user_id):
+    return f'patient_bookings_{user_id}'
+
+
+def medic_bookings_group_name(medic_id):
+    return f'medic_bookings_{medic_id}'
+
+
+def transition_message(event):
+    return {
+        'type': 'booking_update',
+        'message': TRANSITION_MESSAGES[event.target],
+        'status': event.target,
+    }
+
+
+def recent_booking_message(event):
+    return {
+        'type': 'recent_booking_changed',
+        'booking_id': event.booking_id,
+        'status': event.target,
+    }
+
+
+def transition_messages(event):
+    # (group, message) pairs to send for one transition
+    changed = recent_booking_message(event)
+    return [
+        (booking_group_name(event.booking_id), transition_message(event)),
+        (patient_bookings_group_name(event.patient_id), changed),
+        (medic_bookings_group_name(event.medic_id), changed),
+    ]
+
+
+def notify_transitions(events):
+    async_to_sync(anotify_transitions)(events)
+
+
+async def anotify_transitions(events):
+    channel_layer = get_channel_layer()
+    for event in events:
+        for group, message in transition_messages(event):
+            await channel_layer.group_send(group, message)
@@ -0,0 +1,122 @@
+import logging
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundSms
+from .sms_client import PermanentSmsError, get_transport
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'SMS_MAX_ATTEMPTS', 6)
+RETRY_BASE_SECONDS = getattr(settings, 'SMS_RETRY_BASE_SECONDS', 5)
+RETRY_MAX_SECONDS = getattr(settings, 'SMS_RETRY_MAX_SECONDS', 15 * 60)
+# A claimed message not finished within this window is picked up again
+CLAIM_TIMEOUT_SECONDS = getattr(settings, 'SMS_CLAIM_TIMEOUT_SECONDS', 5 * 60)
+
+
+def enqueue_sms(phone_number, message, idempotency_key=None):
+    """
+    Store an SMS for background delivery. Enqueueing again with the same
+    idempotency_key returns the existing message instead of sending twice.
+    """
+    sms, _ = OutboundSms.objects.get_or_create(
+        idempotency_key=idempotency_key or uuid.uuid4().hex,
+        defaults={'phone_number': phone_number, 'body': message},
+    )
+    return sms
+
+
+def retry_delay(attempts):
+    # Exponential backoff with jitter
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_due_messages(limit):
+    """
+    Mark up to `limit` due messages as sending under a fresh claim token, so
+    concurrent workers never deliver the same message.
+    """
+    now = timezone.now()
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(
+        status='sending', updated_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)
+    )
+    ids = list(OutboundSms.objects.filter(due).order_by('next_attempt_at').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    OutboundSms.objects.filter(due, id__in=ids).update(status='sending', claim_token=token, updated_at=now)
+    return list(OutboundSms.objects.filter(claim_token=token, status='sending'))
+
+
+def deliver(sms, transport):
+    attempts = sms.attempts + 1
+    claimed = OutboundSms.objects.filter(id=sms.id, claim_token=sms.claim_token, status='sending')
+    try:
+        message_id = transport.send(sms.phone_number, sms.body)
+    except Exception as e:
+        permanent = isinstance(e, PermanentSmsError) or attempts >= MAX_ATTEMPTS
+        logger.warning(f"SMS {sms.id} attempt {attempts} failed: {e}")
+        claimed.update(
+            status='failed' if permanent else 'pending',
+            attempts=attempts,
+            next_attempt_at=timezone.now() + retry_delay(attempts),
+            last_error=str(e),
+            updated_at=timezone.now(),
+        )
+        return False
+
+    claimed.update(
+        status='sent',
+        attempts=attempts,
+        provider_message_id=message_id or '',
+        last_error='',
+        sent_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    return True
+
+
+def deliver_in_thread(sms, transport):
+    try:
+        return deliver(sms, transport)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Long-lived delivery threads, so each keeps its transport connection
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.SMS_DELIVERY_CONCURRENCY, thread_name_prefix='sms-delivery'
+            )
+        return _executor
+
+
+def deliver_pending(batch_size=50):
+    """
+    Deliver one batch of due messages, at most SMS_DELIVERY_CONCURRENCY at a
+    time. Returns the number of messages attempted.
+    """
+    messages = claim_due_messages(batch_size)
+    if not messages:
+        return 0
+
+    transport = get_transport()
+    list(get_executor().map(lambda sms: deliver_in_thread(sms, transport), messages))
+    return len(messages)
@@ -0,0 +1,107 @@
+import heapq
+import json
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class DistanceCursorPagination(BasePagination):
+    """
+    Cursor pagination over an in-memory list of medics annotated with
+    `distance_km`. Each page is picked with a bounded heap, so the full match
+    set is never sorted or serialized.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def sort_key(self, medic):
+        # Best rated first, nearest among equal ratings
+        if self.ordering == '-rating':
+            return (-medic.rating_avg, medic.distance_km, medic.id)
+        return (medic.distance_km, medic.id)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = request.query_params.get(self.ordering_query_param)
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        candidates = queryset
+        if self.cursor is not None:
+            candidates = (medic for medic in queryset if self.sort_key(medic) > self.cursor)
+
+        # Fetch one extra item to know whether another page exists
+        page = heapq.nsmallest(self.page_size + 1, candidates, key=self.sort_key)
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            key = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Must compare against sort_key() for the current ordering
+        key_length = 3 if self.ordering == '-rating' else 2
+        if not isinstance(key, list) or len(key) != key_length or not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) for value in key
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return tuple(key)
+
+    def encode_cursor(self, key):
+        return urlsafe_b64encode(json.dumps(list(key)).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.sort_key(self.page[-1])))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class ReviewCursorPagination(CursorPagination):
+    """
+    Latest reviews first, keyed on created_at so each page is an index range
+    scan rather than an OFFSET.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    ordering = '-created_at'
+
+
+class BookingCursorPagination(CursorPagination):
+    """
+    Newest bookings first; see ReviewCursorPagination.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    ordering = '-created_at'
@@ -0,0 +1,125 @@
+"""
+Read-replica routing.
+
+Views opt in with ReplicaReadMixin: their safe requests read from a healthy
+replica, unless the client wrote something within the last few seconds,
+in which case ReadYourWritesMiddleware keeps it on the primary.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DATABASES = getattr(settings, 'REPLICA_DATABASES', [])
+# Seconds a client stays on the primary after a write
+PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+# Seconds a replica health check result is trusted
+HEALTH_CHECK_INTERVAL = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias reads in the current request go to; None means the primary
+read_alias = ContextVar('read_alias', default=None)
+# Set while the current client is pinned to the primary
+pinned = ContextVar('pinned', default=False)
+
+# alias -> (healthy, checked_at)
+health = {}
+
+
+def is_healthy(alias):
+    healthy, checked_at = health.get(alias, (None, 0))
+    if healthy is not None and time.monotonic() - checked_at < HEALTH_CHECK_INTERVAL:
+        return healthy
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except DatabaseError:
+        logger.warning(f"Replica {alias} failed its health check", exc_info=True)
+        connections[alias].close()
+        healthy = False
+    health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+def choose_replica():
+    """
+    A random healthy replica, or None when reads should use the primary.
+    """
+    if pinned.get():
+        return None
+    candidates = [alias for alias in REPLICA_DATABASES if is_healthy(alias)]
+    return random.choice(candidates) if candidates else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in REPLICA_DATABASES
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests of a DRF view from a replica.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        alias = choose_replica() if request.method in SAFE_METHODS else None
+        token = read_alias.set(alias)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            read_alias.reset(token)
+
+
+def pin_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        client = f'user:{user.pk}'
+    else:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        client = forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR')
+    return f'replica_pin:{client}'
+
+
+class ReadYourWritesMiddleware:
+    """
+    After a successful unsafe request, keep the client's reads on the
+    primary for PIN_SECONDS so they see their own write despite replica lag.
+    The pin lives in the cache, so it holds across workers when the cache
+    is shared.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not REPLICA_DATABASES:
+            return self.get_response(request)
+
+        key = pin_key(request)
+        token = pinned.set(cache.get(key, False))
+        try:
+            response = self.get_response(request)
+        finally:
+            pinned.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            cache.set(pin_key(request), True, PIN_SECONDS)
+        return response
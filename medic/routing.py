@@ -3,5 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/booking/(?P<booking_id>\d+)/$', consumers.BookingConsumer.as_asgi()),
-    re_path(r'ws/socket-server', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/chat/(?P<booking_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/bookings/recent/(?P<role>patient|nurse)/$', consumers.RecentBookingConsumer.as_asgi()),
 ]
\ No newline at end of file
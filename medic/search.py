@@ -0,0 +1,123 @@
+import re
+
+from django.db import connection, connections, router
+
+# SQLite keeps documents in an FTS5 table keyed by medic id (its rowid)
+SQLITE_TABLE = 'medic_medic_fts'
+# Postgres keeps a weighted tsvector per medic behind a GIN index
+POSTGRES_TABLE = 'medic_medic_search'
+
+# Column weights for bm25 in FTS5 column order
+SQLITE_WEIGHTS = (10.0, 1.0, 5.0, 2.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_backend(conn=None):
+    # Full-text search is only available on these vendors; others fall back
+    # to the plain icontains query
+    vendor = (conn or connection).vendor
+    if vendor in ('sqlite', 'postgresql'):
+        return vendor
+    return None
+
+
+def write_documents(conn, documents):
+    """
+    Upsert search documents given as (medic_id, name, description,
+    expertise, email) tuples.
+    """
+    backend = search_backend(conn)
+    documents = list(documents)
+    if backend is None or not documents:
+        return
+
+    with conn.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.executemany(
+                f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s",
+                [(document[0],) for document in documents],
+            )
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, expertise, email) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                documents,
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (medic_id, document) VALUES (%s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'D') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C')) "
+                "ON CONFLICT (medic_id) DO UPDATE SET document = EXCLUDED.document",
+                documents,
+            )
+
+
+def delete_documents(conn, medic_ids):
+    backend = search_backend(conn)
+    medic_ids = list(medic_ids)
+    if backend is None or not medic_ids:
+        return
+
+    table, column = (SQLITE_TABLE, 'rowid') if backend == 'sqlite' else (POSTGRES_TABLE, 'medic_id')
+    with conn.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table} WHERE {column} = %s", [(medic_id,) for medic_id in medic_ids])
+
+
+def index_medics(medics):
+    """
+    Refresh the search documents of the given Medic instances.
+    """
+    medics = list(medics)
+    if search_backend() is None or not medics:
+        return
+
+    from .models import Medic
+
+    expertise = {medic.id: [] for medic in medics}
+    through = Medic.expertise.through.objects.filter(medic_id__in=expertise)
+    for medic_id, name in through.values_list('medic_id', 'expertise__name'):
+        expertise[medic_id].append(name)
+
+    write_documents(connection, [
+        (medic.id, medic.name, medic.description or '', ' '.join(expertise[medic.id]), medic.email or '')
+        for medic in medics
+    ])
+
+
+def search_medic_ids(query, limit):
+    """
+    Return up to `limit` medic ids matching every word of `query` as a prefix,
+    best match first, or None when the database has no full-text support.
+    """
+    from .models import Medic
+
+    # Searches follow the read routing, so they can be served by a replica
+    conn = connections[router.db_for_read(Medic)]
+    backend = search_backend(conn)
+    if backend is None:
+        return None
+
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return []
+
+    with conn.cursor() as cursor:
+        if backend == 'sqlite':
+            match = ' '.join(f'"{token}"*' for token in tokens)
+            weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+            cursor.execute(
+                f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+                f"ORDER BY bm25({SQLITE_TABLE}, {weights}) LIMIT %s",
+                [match, limit],
+            )
+        else:
+            match = ' & '.join(f'{token}:*' for token in tokens)
+            cursor.execute(
+                f"SELECT medic_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s) "
+                f"ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC, medic_id LIMIT %s",
+                [match, match, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,12 +1,36 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Medic, Location, Review, SocialAuthData, Booking
+from .models import Medic, Location, Review, SocialAuthData, Booking, CustomUser, Expertise, UploadSession
+from .images import variant_urls
+
+def requested_fields(request):
+    # Comma-separated ?fields= sparse fieldset, or None for every field
+    if request is None or request.method != 'GET':
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+class SparseFieldsetMixin:
+    """
+    Drops every field not listed in the request's ?fields= parameter, so
+    unrequested method fields and nested relations are never computed.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is None:
+            return
+        for name in set(self.fields) - fields:
+            self.fields.pop(name)
 
 class SocialAuthDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = SocialAuthData
         fields = '__all__'
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tags = serializers.SerializerMethodField()
     user = serializers.SerializerMethodField()
     user_id = serializers.CharField(write_only=True, allow_null=True)
@@ -17,6 +41,11 @@ class ReviewSerializer(serializers.ModelSerializer):
         depth = 1
         fields = ['id', 'medic', 'user', 'status', 'description', 'user_id',  'medic_id', 'rating', 'tags', 'extra_fields', 'created_at', 'updated_at']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Everything the nested representation touches, in a fixed number of queries
+        return queryset.select_related('social_user', 'default_user').prefetch_related('tags')
+
     def get_tags(self, obj):
         return [tag.name for tag in obj.tags.all()]
     
@@ -62,28 +91,56 @@ class LocationSerializer(serializers.ModelSerializer):
         model = Location
         fields = ['name', 'latitude', 'longitude']
 
-class MedicSerializer(serializers.ModelSerializer):
+class MedicSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     location = LocationSerializer()
     expertise = serializers.SerializerMethodField()
     reviews = serializers.SerializerMethodField()  # Use source to specify the reverse relationship
+    picture_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Medic
-        fields = ['id', 'name', 'picture', 'email', 'phone_number', 'description', 'location', 'verified', 'expertise', 'available', 'area_coverage_km', 'extra_fields', 'created_at', 'updated_at', 'reviews']
+        fields = ['id', 'name', 'picture', 'picture_variants', 'email', 'phone_number', 'description', 'location', 'verified', 'expertise', 'available', 'area_coverage_km', 'extra_fields', 'review_count', 'rating_avg', 'created_at', 'updated_at', 'reviews']
+        read_only_fields = ['review_count', 'rating_avg']
+
+    @staticmethod
+    def get_prefetch_lookups(fields=None):
+        lookups = []
+        # Embedded reviews render their medic, expertise ids included
+        if fields is None or 'expertise' in fields or 'reviews' in fields:
+            lookups.append('expertise')
+        if fields is None or 'reviews' in fields:
+            active_reviews = ReviewSerializer.setup_eager_loading(Review.objects.filter(status='active'))
+            lookups.append(Prefetch('review_items', queryset=active_reviews, to_attr='active_reviews'))
+        return lookups
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        return queryset.select_related('location').prefetch_related(*cls.get_prefetch_lookups(fields))
 
     def get_expertise(self, obj):
         return [expertise.name for expertise in obj.expertise.all()]
     
+    def get_picture_variants(self, obj):
+        request = self.context.get('request')
+        return variant_urls(obj, request.build_absolute_uri if request else lambda url: url)
+
     def get_reviews(self, obj):
-        reviews = obj.review_items.filter(status='active')  # Filter only active reviews
+        reviews = getattr(obj, 'active_reviews', None)  # Prefetched by setup_eager_loading
+        if reviews is None:
+            reviews = obj.review_items.filter(status='active')  # Filter only active reviews
         serializer = ReviewSerializer(reviews, many=True)
         return serializer.data
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         request = self.context.get('request')
-        if instance.picture and request:
+        if instance.picture and request and 'picture' in representation:
             representation['picture'] = request.build_absolute_uri(instance.picture.url)
+        # Set by nearest-medic searches
+        distance = getattr(instance, 'distance_km', None)
+        fields = requested_fields(request)
+        if distance is not None and (fields is None or 'distance_km' in fields):
+            representation['distance_km'] = round(distance, 3)
         return representation
     
     def create(self, validated_data):
@@ -99,8 +156,79 @@ class MedicSerializer(serializers.ModelSerializer):
         
         return nurse_instance
     
-class BookingSerializer(serializers.ModelSerializer):
+class MedicSummarySerializer(MedicSerializer):
+    """
+    Compact medic representation for list and search responses.
+    """
+    class Meta:
+        model = Medic
+        fields = ['id', 'name', 'picture', 'picture_variants', 'expertise', 'rating_avg', 'review_count', 'available']
+        read_only_fields = fields
+
+    @staticmethod
+    def get_prefetch_lookups(fields=None):
+        if fields is None or 'expertise' in fields:
+            return ['expertise']
+        return []
+
+class BookingPatientSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'email', 'first_name', 'last_name']
+
+class BookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Only the patient's public details, never the rest of their account
+    patient = BookingPatientSerializer(read_only=True)
+
     class Meta:
         model = Booking
         fields = '__all__'
-        depth = 1
\ No newline at end of file
+        depth = 1
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Everything the depth=1 representation touches, so serializing never
+        # queries (which also keeps it safe inside async code)
+        return queryset.select_related('patient', 'medic', 'care_type').prefetch_related('medic__expertise')
+
+class BookingMedicSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Medic
+        fields = ['id', 'name', 'picture', 'phone_number']
+
+class BookingCareTypeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Expertise
+        fields = ['id', 'name']
+
+class BookingListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Lean booking representation for listings: only public details of the
+    patient and medic, all loaded with a single joined query.
+    """
+    patient = BookingPatientSerializer(read_only=True)
+    medic = BookingMedicSerializer(read_only=True)
+    care_type = BookingCareTypeSerializer(read_only=True)
+
+    class Meta:
+        model = Booking
+        fields = ['id', 'status', 'patient', 'medic', 'care_type', 'latitude', 'longitude', 'created_at', 'updated_at', 'timeout_at']
+        read_only_fields = fields
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('patient', 'medic', 'care_type').only(
+            *BookingListSerializer.Meta.fields,
+            'patient__email', 'patient__first_name', 'patient__last_name',
+            'medic__name', 'medic__picture', 'medic__phone_number',
+            'care_type__name',
+        )
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    # Byte offset the next chunk must start at
+    offset = serializers.IntegerField(source='received_size', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'purpose', 'medic', 'filename', 'total_size', 'offset', 'status', 'error', 'result', 'expires_at']
+        read_only_fields = ['id', 'status', 'error', 'result', 'expires_at']
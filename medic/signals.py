@@ -0,0 +1,160 @@
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_search_cache
+from .images import update_picture_variants
+from .models import CoverageCell, Expertise, Location, Medic, Review
+from .search import delete_documents, index_medics
+from .utils import coverage_cells
+
+
+def rating_contribution(status, rating):
+    # Only active reviews count towards a medic's rating
+    if status == 'active':
+        return 1, rating
+    return 0, 0
+
+
+def apply_rating_delta(medic_id, count_delta, sum_delta):
+    if medic_id is None or (count_delta == 0 and sum_delta == 0):
+        return
+
+    review_count = F('review_count') + count_delta
+    rating_sum = F('rating_sum') + sum_delta
+
+    # All SET expressions see the pre-update row, so the average is derived
+    # from the same deltas rather than the freshly written columns
+    Medic.objects.filter(pk=medic_id).update(
+        review_count=review_count,
+        rating_sum=rating_sum,
+        rating_avg=Case(
+            When(review_count__gt=-count_delta, then=rating_sum / Cast(review_count, FloatField())),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_rating = (
+        Review.objects.filter(pk=instance.pk).values_list('medic_id', 'status', 'rating').first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    count, total = rating_contribution(instance.status, instance.rating)
+    previous = getattr(instance, '_previous_rating', None)
+    if previous is None:
+        apply_rating_delta(instance.medic_id, count, total)
+        return
+
+    previous_medic_id, previous_status, previous_rating = previous
+    previous_count, previous_total = rating_contribution(previous_status, previous_rating)
+    if previous_medic_id == instance.medic_id:
+        apply_rating_delta(instance.medic_id, count - previous_count, total - previous_total)
+    else:
+        apply_rating_delta(previous_medic_id, -previous_count, -previous_total)
+        apply_rating_delta(instance.medic_id, count, total)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    count, total = rating_contribution(instance.status, instance.rating)
+    apply_rating_delta(instance.medic_id, -count, -total)
+
+
+@receiver(post_save, sender=Medic)
+@receiver(post_delete, sender=Medic)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=Expertise)
+@receiver(post_delete, sender=Expertise)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_medic_search(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_search_cache()
+
+
+@receiver(m2m_changed, sender=Medic.expertise.through)
+def invalidate_medic_search_on_expertise(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_search_cache()
+
+
+# Fields that make up a medic's search document
+SEARCH_DOCUMENT_FIELDS = {'name', 'description', 'email'}
+
+
+@receiver(post_save, sender=Medic)
+def index_medic_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not SEARCH_DOCUMENT_FIELDS & set(update_fields)):
+        return
+    index_medics([instance])
+
+
+@receiver(post_save, sender=Medic)
+def build_medic_picture_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'picture' not in update_fields):
+        return
+    update_picture_variants(instance)
+
+
+@receiver(post_delete, sender=Medic)
+def remove_medic_from_index(sender, instance, **kwargs):
+    delete_documents(connection, [instance.id])
+
+
+@receiver(m2m_changed, sender=Medic.expertise.through)
+def index_medic_on_expertise(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_medics([instance])
+    elif pk_set:
+        index_medics(Medic.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Expertise)
+def index_medics_on_expertise_rename(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        index_medics(Medic.objects.filter(expertise=instance))
+
+
+# Fields that decide which grid cells a medic's coverage reaches
+COVERAGE_FIELDS = {'area_coverage_km', 'location'}
+
+
+def update_coverage_cells(medics):
+    medics = list(medics)
+    CoverageCell.objects.filter(medic__in=medics).delete()
+    CoverageCell.objects.bulk_create([
+        CoverageCell(medic=medic, grid_row=row, grid_col=col)
+        for medic in medics if medic.area_coverage_km is not None
+        for row, col in coverage_cells(medic.location.latitude, medic.location.longitude, medic.area_coverage_km)
+    ], batch_size=1000)
+
+
+@receiver(post_save, sender=Medic)
+def index_medic_coverage(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not COVERAGE_FIELDS & set(update_fields)):
+        return
+    update_coverage_cells([instance])
+
+
+@receiver(post_save, sender=Location)
+def index_coverage_on_move(sender, instance, created, raw=False, **kwargs):
+    # A new location has no medics yet
+    if not raw and not created:
+        update_coverage_cells(Medic.objects.filter(location=instance).select_related('location'))
@@ -1,17 +1,80 @@
 import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
 
 
+class PermanentSmsError(Exception):
+    """
+    Delivery failed in a way retrying will not fix, e.g. an invalid number.
+    """
+
+
+class TwilioTransport:
+    def __init__(self):
+        self.local = threading.local()
+
+    def get_client(self):
+        # One client (and HTTP connection pool) per delivery thread, reused
+        # for every message it sends
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            # Find your Account SID and Auth Token at twilio.com/console
+            # and set the environment variables. See http://twil.io/secure
+            client = Client(
+                os.environ['TWILIO_ACCOUNT_SID'],
+                os.environ['TWILIO_AUTH_TOKEN'],
+                http_client=TwilioHttpClient(timeout=settings.SMS_SEND_TIMEOUT),
+            )
+            self.local.client = client
+        return client
+
+    def send(self, phone_number, message):
+        try:
+            sent = self.get_client().messages.create(
+                body=message,
+                from_=settings.TWILIO_FROM_NUMBER,
+                to=phone_number
+            )
+        except TwilioRestException as e:
+            # Rate limits and server errors are worth retrying, the rest are not
+            if e.status < 500 and e.status != 429:
+                raise PermanentSmsError(str(e)) from e
+            raise
+        return sent.sid
+
+
+class FakeTransport:
+    """
+    Records messages in memory instead of sending them; for tests and local
+    development.
+    """
+    outbox = []
+
+    def send(self, phone_number, message):
+        message_id = f'fake-{uuid.uuid4().hex}'
+        self.outbox.append({'id': message_id, 'to': phone_number, 'body': message})
+        return message_id
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = import_string(settings.SMS_TRANSPORT)()
+        return _transport
+
+
 def send_sms(phone_number, message):
-    # Find your Account SID and Auth Token at twilio.com/console
-    # and set the environment variables. See http://twil.io/secure
-    account_sid = os.environ['TWILIO_ACCOUNT_SID']
-    auth_token = os.environ['TWILIO_AUTH_TOKEN']
-    client = Client(account_sid, auth_token)
-
-    message = client.messages \
-        .create(
-            body=message,
-            from_='+18486006965',
-            to=phone_number
-        )
+    # Sends immediately on the calling thread; request handlers should use
+    # medic.outbox.enqueue_sms instead
+    return get_transport().send(phone_number, message)
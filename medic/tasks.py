@@ -0,0 +1,63 @@
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .bookings import expire_overdue_bookings
+from .outbox import deliver_pending
+
+logger = logging.getLogger(__name__)
+
+
+async def run_booking_sweeper(interval, batch_size):
+    while True:
+        try:
+            events = await database_sync_to_async(expire_overdue_bookings)(batch_size=batch_size)
+            if events:
+                logger.info(f"Expired {len(events)} overdue booking(s)")
+        except Exception:
+            logger.exception("Booking sweep failed")
+        await asyncio.sleep(interval)
+
+
+async def run_sms_outbox(interval, batch_size):
+    while True:
+        attempted = 0
+        try:
+            attempted = await database_sync_to_async(deliver_pending)(batch_size=batch_size)
+        except Exception:
+            logger.exception("SMS delivery failed")
+        # Drain a backlog without waiting between full batches
+        if attempted < batch_size:
+            await asyncio.sleep(interval)
+
+
+def background_tasks():
+    # Coroutines to run for the lifetime of an ASGI worker
+    tasks = []
+    if settings.BOOKING_SWEEPER_INTERVAL > 0:
+        tasks.append(run_booking_sweeper(settings.BOOKING_SWEEPER_INTERVAL, settings.BOOKING_SWEEPER_BATCH_SIZE))
+    if settings.SMS_OUTBOX_INTERVAL > 0:
+        tasks.append(run_sms_outbox(settings.SMS_OUTBOX_INTERVAL, settings.SMS_OUTBOX_BATCH_SIZE))
+    return tasks
+
+
+class LifespanApp:
+    """
+    ASGI lifespan handler that starts the background tasks on worker startup
+    and cancels them on shutdown.
+    """
+    async def __call__(self, scope, receive, send):
+        tasks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                tasks = [asyncio.ensure_future(task) for task in background_tasks()]
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
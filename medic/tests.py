@@ -0,0 +1,1016 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .bookings import InvalidTransition, MedicUnavailable, expire_overdue_bookings, initiate_booking, transition_booking
+from . import locations, outbox, uploads
+from .channel_layers import DatabaseChannelLayer
+from .chat import WriteBehindBuffer, new_message
+from .consumers import RecentBookingConsumer
+from .routers import ReplicaRouter, health, read_alias
+from .routing import websocket_urlpatterns
+from .sms_client import FakeTransport, PermanentSmsError
+from .models import Booking, ChatMessage, CustomUser, Expertise, IdentityVerification, Location, Medic, OutboundSms, Review, SocialAuthData, Tag, UploadSession
+from .uploads import UploadError, partial_path, upload_expiry, write_chunk
+
+
+def create_medic(name, latitude=28.6, longitude=77.2, area_coverage_km=5, **kwargs):
+    location = Location.objects.create(name=name, latitude=latitude, longitude=longitude)
+    return Medic.objects.create(
+        name=name,
+        picture='',
+        email=f'{name}@example.com',
+        phone_number='1',
+        description='',
+        location=location,
+        area_coverage_km=area_coverage_km,
+        **kwargs,
+    )
+
+
+def create_reviews(medic, count):
+    tag = Tag.objects.create(name='kind')
+    for i in range(count):
+        reviewer = SocialAuthData.objects.create(social_user_id=f'{medic.id}-{i}', provider='google', email=f'r{i}@example.com', name=f'r{i}')
+        review = Review.objects.create(medic=medic, social_user=reviewer, description='', rating=4, status='active')
+        review.tags.add(tag)
+
+
+def create_patient(name):
+    return CustomUser.objects.create_user(email=f'{name}@example.com')
+
+
+def create_booking(name, status='initiated', **fields):
+    medic = create_medic(f'{name}-medic', available=status not in Booking.MEDIC_HOLD_STATUSES)
+    return Booking.objects.create(patient=create_patient(f'{name}-patient'), medic=medic, status=status, **fields)
+
+
+class InitiateBookingConcurrencyTests(TransactionTestCase):
+    """
+    Parallel initiations against the same medics, each from its own thread
+    and database connection.
+    """
+    MEDICS = 5
+    PATIENTS = 40
+
+    def test_one_winner_per_medic(self):
+        medics = [create_medic(f'medic{i}') for i in range(self.MEDICS)]
+        patients = [create_patient(f'patient{i}') for i in range(self.PATIENTS)]
+        # Every patient tries every medic, in a different order per patient
+        attempts = [(patient, medics[(i + j) % self.MEDICS]) for i, patient in enumerate(patients) for j in range(self.MEDICS)]
+
+        start = threading.Barrier(len(patients))
+        outcomes = []
+        errors = []
+
+        def book(patient):
+            start.wait()
+            try:
+                for attempt_patient, medic in attempts:
+                    if attempt_patient is not patient:
+                        continue
+                    try:
+                        initiate_booking(patient, Medic.objects.get(id=medic.id), notify=False)
+                    except MedicUnavailable:
+                        outcomes.append((patient.id, medic.id, False))
+                    else:
+                        outcomes.append((patient.id, medic.id, True))
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=book, args=(patient,)) for patient in patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        winners = [(patient_id, medic_id) for patient_id, medic_id, won in outcomes if won]
+        self.assertEqual(sorted(medic_id for _, medic_id in winners), sorted(medic.id for medic in medics))
+        self.assertEqual(len({patient_id for patient_id, _ in winners}), self.MEDICS)
+
+        for medic in medics:
+            self.assertEqual(Booking.objects.filter(medic=medic).exclude(status='cancelled').count(), 1)
+        self.assertFalse(Medic.objects.filter(available=True).exists())
+
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.medic = create_medic('rated')
+
+    def review(self, rating, status='active', medic=None):
+        return Review.objects.create(medic=medic or self.medic, description='', rating=rating, status=status)
+
+    def assert_rating(self, count, average, medic=None):
+        medic = Medic.objects.get(id=(medic or self.medic).id)
+        self.assertEqual(medic.review_count, count)
+        self.assertAlmostEqual(medic.rating_avg, average)
+
+    def test_only_active_reviews_count(self):
+        self.review(5)
+        self.review(2)
+        self.review(1, status='pending')
+        self.assert_rating(2, 3.5)
+
+    def test_edits_and_status_changes(self):
+        review = self.review(4)
+        pending = self.review(2, status='pending')
+        pending.status = 'active'
+        pending.save()
+        self.assert_rating(2, 3)
+
+        review.rating = 5
+        review.save()
+        self.assert_rating(2, 3.5)
+
+        review.status = 'pending'
+        review.save()
+        self.assert_rating(1, 2)
+
+    def test_moving_a_review_between_medics(self):
+        other = create_medic('other')
+        review = self.review(4)
+        review.medic = other
+        review.save()
+        self.assert_rating(0, 0)
+        self.assert_rating(1, 4, medic=other)
+
+    def test_deleting_the_last_review_resets_the_average(self):
+        first, second = self.review(3), self.review(5)
+        first.delete()
+        self.assert_rating(1, 5)
+        second.delete()
+        self.assert_rating(0, 0)
+
+class MedicQueryCountTests(TestCase):
+    """
+    The medic list and detail endpoints run a fixed number of queries
+    however many medics, expertise or reviews they return.
+    """
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.expertise = [Expertise.objects.create(name=name) for name in ('wound care', 'elderly care')]
+
+    def create_medics(self, count):
+        for i in range(count):
+            medic = create_medic(f'medic{i}', latitude=28.6 + i * 0.0001)
+            medic.expertise.set(self.expertise)
+            create_reviews(medic, 2)
+
+    def assert_list_queries(self, medics):
+        self.create_medics(medics)
+        # Candidate medics with locations, expertise
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/medics/', {'lat': 28.6, 'lon': 77.2, 'limit': 100})
+        self.assertEqual(len(response.data['results']), medics)
+
+    def test_list_with_few_medics(self):
+        self.assert_list_queries(3)
+
+    def test_list_with_many_medics(self):
+        self.assert_list_queries(30)
+
+    def assert_detail_queries(self, reviews, fields=None):
+        medic = create_medic('detail')
+        medic.expertise.set(self.expertise)
+        create_reviews(medic, reviews)
+        params = {'fields': fields} if fields else {}
+        # Medic with location, expertise, reviews with their users, tags
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/medics/{medic.id}/', params)
+        self.assertEqual(len(response.data['reviews']), reviews)
+
+    def test_detail_with_few_reviews(self):
+        self.assert_detail_queries(3)
+
+    def test_detail_with_many_reviews(self):
+        self.assert_detail_queries(12)
+
+    def test_detail_reviews_only(self):
+        # Embedded reviews render their medic's expertise ids
+        self.assert_detail_queries(3, fields='reviews')
+        self.assert_detail_queries(12, fields='reviews')
+
+
+
+class ListQueryCountTests(TestCase):
+    """
+    The review and booking lists run a fixed number of queries however many
+    rows a page holds.
+    """
+    def setUp(self):
+        self.client = APIClient()
+
+    def assert_review_queries(self, reviews):
+        medic = create_medic('reviewed')
+        medic.expertise.set([Expertise.objects.create(name='wound care')])
+        create_reviews(medic, reviews)
+        # Reviews with medic and users, medic expertise, tags
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/reviews/', {'medic_id': medic.id, 'limit': 100})
+        self.assertEqual(len(response.data['results']), reviews)
+
+    def test_reviews_page_with_few_rows(self):
+        self.assert_review_queries(2)
+
+    def test_reviews_page_with_many_rows(self):
+        self.assert_review_queries(25)
+
+    def assert_booking_queries(self, bookings):
+        care_type = Expertise.objects.create(name='wound care')
+        for i in range(bookings):
+            create_booking(f'booked{i}', 'completed', care_type=care_type)
+        # Bookings joined with patient, medic and care type
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bookings/', {'limit': 100})
+        self.assertEqual(len(response.data['results']), bookings)
+
+    def test_bookings_page_with_few_rows(self):
+        self.assert_booking_queries(2)
+
+    def test_bookings_page_with_many_rows(self):
+        self.assert_booking_queries(25)
+
+class CoverageSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, lat, lon):
+        response = self.client.get('/api/medics/', {'lat': lat, 'lon': lon})
+        return [medic['name'] for medic in response.data['results']]
+
+    def test_matches_follow_each_radius(self):
+        create_medic('near', latitude=28.6, longitude=77.2, area_coverage_km=5)
+        create_medic('wide', latitude=27.6, longitude=77.2, area_coverage_km=125)
+        self.assertEqual(self.search(28.6, 77.2), ['near', 'wide'])
+        # ~55 km from both: only the wide coverage reaches
+        self.assertEqual(self.search(28.1, 77.2), ['wide'])
+        self.assertEqual(self.search(30.0, 77.2), [])
+
+    def test_index_follows_moves_and_radius_changes(self):
+        medic = create_medic('mover', latitude=28.6, longitude=77.2, area_coverage_km=5)
+        medic.location.latitude = 19.0
+        medic.location.save()
+        self.assertEqual(self.search(28.6, 77.2), [])
+        self.assertEqual(self.search(19.0, 77.2), ['mover'])
+
+        medic.area_coverage_km = 100
+        medic.save()
+        self.assertEqual(self.search(19.5, 77.2), ['mover'])
+
+        medic.area_coverage_km = None
+        medic.save()
+        self.assertEqual(self.search(19.0, 77.2), [])
+
+    def test_non_finite_coordinates_are_rejected(self):
+        for lat, lon in [('nan', 77.2), (28.6, 'inf'), ('-Infinity', 77.2), ('north', 77.2)]:
+            response = self.client.get('/api/medics/', {'lat': lat, 'lon': lon})
+            self.assertEqual(response.status_code, 400, (lat, lon))
+
+
+class SearchCacheTests(TestCase):
+    """
+    Nearest-medic searches share cached candidates per grid cell, but each
+    response is computed from the requester's own point.
+    """
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, lat, lon, **params):
+        return self.client.get('/api/medics/', {'lat': lat, 'lon': lon, **params})
+
+    def test_coverage_uses_the_exact_point(self):
+        create_medic('edge', latitude=28.6, longitude=77.2, area_coverage_km=5)
+        # About 30 m inside and outside the radius, in the same cell
+        inside = self.search(28.6447, 77.2)
+        outside = self.search(28.6453, 77.2)
+        self.assertEqual(inside['X-Cache'], 'MISS')
+        self.assertEqual(outside['X-Cache'], 'HIT')
+        self.assertEqual([medic['name'] for medic in inside.data['results']], ['edge'])
+        self.assertEqual(outside.data['results'], [])
+
+    def test_next_link_carries_only_the_requesters_point(self):
+        for i in range(3):
+            create_medic(f'medic{i}', latitude=28.6 + i * 0.001)
+        self.search('28.60012', '77.20034', limit=1)
+        response = self.search('28.60014', '77.20031', limit=1)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIn('28.60014', response.data['next'])
+        self.assertNotIn('28.60012', response.data['next'])
+        self.assertNotIn('77.20034', response.data['next'])
+
+    def test_search_terms_cache_the_response(self):
+        create_medic('findme')
+        self.assertEqual(self.client.get('/api/medics/', {'search': 'findme'})['X-Cache'], 'MISS')
+        response = self.client.get('/api/medics/', {'search': 'findme'})
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual([medic['name'] for medic in response.data], ['findme'])
+
+
+class DistanceCursorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i in range(3):
+            create_medic(f'medic{i}', latitude=28.6 + i * 0.001)
+
+    def search(self, **params):
+        return self.client.get('/api/medics/', {'lat': 28.6, 'lon': 77.2, 'limit': 2, **params})
+
+    def test_pages_follow_distance(self):
+        first = self.search()
+        self.assertEqual([medic['name'] for medic in first.data['results']], ['medic0', 'medic1'])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([medic['name'] for medic in second.data['results']], ['medic2'])
+        self.assertIsNone(second.data['next'])
+
+    def test_malformed_cursors_are_not_found(self):
+        for key in ['"a"', '["a"]', '[1]', '[1, 2, 3]', '{"a": 1}', '[true, 1]', '[NaN, 1]', '[Infinity, 1]', 'not json']:
+            cursor = urlsafe_b64encode(key.encode()).decode()
+            self.assertEqual(self.search(cursor=cursor).status_code, 404, key)
+        # A distance cursor is one element short for the rating ordering
+        cursor = urlsafe_b64encode(b'[0.5, 1]').decode()
+        self.assertEqual(self.search(cursor=cursor, ordering='-rating').status_code, 404)
+
+
+
+
+class BookingTransitionTests(TestCase):
+    def test_allowed_move(self):
+        booking = create_booking('moving', 'location_shared')
+        event = transition_booking(booking.id, 'otp_sent', notify=False)
+        self.assertEqual((event.source, event.target), ('location_shared', 'otp_sent'))
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'otp_sent')
+
+    def test_rejected_move(self):
+        booking = create_booking('done', 'completed')
+        with self.assertRaises(InvalidTransition):
+            transition_booking(booking.id, 'confirmed', notify=False)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'completed')
+
+    def test_medic_is_released_when_a_booking_ends(self):
+        for target in ('completed', 'cancelled'):
+            booking = create_booking(target, 'in_progress')
+            transition_booking(booking.id, target, notify=False)
+            self.assertTrue(Medic.objects.get(id=booking.medic_id).available, target)
+
+        # Confirmed no longer holds the medic, so moving on releases nothing
+        booking = create_booking('confirmed', 'confirmed')
+        Medic.objects.filter(id=booking.medic_id).update(available=False)
+        transition_booking(booking.id, 'completed', notify=False)
+        self.assertFalse(Medic.objects.get(id=booking.medic_id).available)
+
+    def test_notification_waits_for_commit(self):
+        booking = create_booking('notified')
+        with mock.patch('medic.bookings.notify_transitions') as notify:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                event = transition_booking(booking.id, 'location_shared')
+                notify.assert_not_called()
+            self.assertEqual(len(callbacks), 1)
+            notify.assert_called_once_with([event])
+
+            # A rolled-back transition never notifies
+            notify.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    transition_booking(booking.id, 'otp_sent')
+                    raise RuntimeError
+            self.assertEqual(callbacks, [])
+            notify.assert_not_called()
+
+class BookingSweeperTests(TestCase):
+    def overdue(self, name, status='initiated', seconds=60):
+        return create_booking(name, status, timeout_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_cancels_overdue_bookings_and_releases_medics(self):
+        overdue = self.overdue('late')
+        pending = create_booking('waiting', timeout_at=timezone.now() + timedelta(minutes=5))
+        events = expire_overdue_bookings(notify=False)
+
+        self.assertEqual([event.booking_id for event in events], [overdue.id])
+        overdue.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual((overdue.status, pending.status), ('cancelled', 'initiated'))
+        self.assertTrue(Medic.objects.get(id=overdue.medic_id).available)
+        self.assertFalse(Medic.objects.get(id=pending.medic_id).available)
+
+    def test_works_through_every_batch_oldest_first(self):
+        bookings = [self.overdue(f'late{i}', seconds=60 - i) for i in range(5)]
+        events = expire_overdue_bookings(batch_size=2, notify=False)
+        self.assertEqual([event.booking_id for event in events], [booking.id for booking in bookings])
+
+    def test_statuses_that_cannot_be_cancelled_do_not_loop(self):
+        done = self.overdue('done', status='completed')
+        late = self.overdue('late')
+        timeouts = {'completed': 60, 'initiated': 60}
+        with mock.patch('medic.bookings.BOOKING_TIMEOUTS', timeouts):
+            events = expire_overdue_bookings(batch_size=1, notify=False)
+        self.assertEqual([event.booking_id for event in events], [late.id])
+        done.refresh_from_db()
+        self.assertEqual(done.status, 'completed')
+
+class BookingLookupIndexTests(TestCase):
+    """
+    The recent-booking lookups are served by the composite indexes from
+    migration 0014, according to the database's own query plan.
+    """
+    def setUp(self):
+        nurse = CustomUser.objects.create_user(email='nurse@example.com')
+        medics = [create_medic(f'medic{i}', user=nurse if i == 0 else None) for i in range(5)]
+        for i in range(50):
+            patient = create_patient(f'patient{i}')
+            for j, status in enumerate(['completed', 'cancelled', 'initiated']):
+                Booking.objects.create(patient=patient, medic=medics[(i + j) % len(medics)], status=status)
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise be scanned sequentially
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_recent_patient_booking_uses_patient_index(self):
+        # The lookup in RecentPatientBookingView
+        bookings = Booking.objects.filter(patient__email='patient1@example.com', status__in=Booking.ACTIVE_STATUSES)
+        self.assertUsesIndex(bookings.order_by('-created_at')[:1], 'booking_patient_recent_idx')
+
+    def test_recent_nurse_booking_uses_medic_index(self):
+        # The lookup in RecentNurseBookingView
+        bookings = Booking.objects.filter(medic__user__email='nurse@example.com', status__in=Booking.ACTIVE_STATUSES)
+        self.assertUsesIndex(bookings.order_by('-created_at')[:1], 'booking_medic_recent_idx')
+
+
+class RecentBookingConsumerTests(TestCase):
+    def test_pushes_only_public_details(self):
+        patient = create_patient('pushed-patient')
+        medic = create_medic('pushed')
+        Booking.objects.create(patient=patient, medic=medic, status='initiated', otp='1234')
+
+        consumer = RecentBookingConsumer()
+        consumer.role = 'patient'
+        consumer.user = patient
+        booking = async_to_sync(consumer.load_booking)()
+
+        self.assertNotIn('otp', booking)
+        self.assertEqual(set(booking['patient']), {'id', 'email', 'first_name', 'last_name'})
+        self.assertEqual(set(booking['medic']), {'id', 'name', 'picture', 'phone_number'})
+
+
+def channel_layer_worker(pipe, group):
+    """
+    Runs in a forked process: joins `group` from its own layer and
+    connection, then reports the channel name and every message received.
+    """
+    async def run():
+        layer = DatabaseChannelLayer(poll_interval=0.01)
+        channel = await layer.new_channel()
+        await layer.group_add(group, channel)
+        pipe.send(channel)
+        for _ in range(2):
+            pipe.send(await asyncio.wait_for(layer.receive(channel), 10))
+        await layer.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        connections.close_all()
+
+
+class DatabaseChannelLayerProcessTests(TransactionTestCase):
+    """
+    Group and direct sends reach channels owned by other processes, each
+    polling through its own database connection.
+    """
+    WORKERS = 2
+
+    def test_delivery_across_processes(self):
+        # Forked children must not share the parent's connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        pipes = []
+        processes = []
+        for _ in range(self.WORKERS):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=channel_layer_worker, args=(child_end, 'bookings'))
+            process.start()
+            pipes.append(parent_end)
+            processes.append(process)
+
+        try:
+            channels = [self.receive(pipe) for pipe in pipes]
+            self.assertEqual(len({DatabaseChannelLayer().non_local_name(channel) for channel in channels}), self.WORKERS)
+
+            layer = DatabaseChannelLayer()
+            async_to_sync(layer.group_send)('bookings', {'type': 'booking.update', 'status': 'confirmed'})
+            for channel in channels:
+                async_to_sync(layer.send)(channel, {'type': 'direct', 'channel': channel})
+
+            for pipe, channel in zip(pipes, channels):
+                self.assertEqual(self.receive(pipe), {'type': 'booking.update', 'status': 'confirmed'})
+                self.assertEqual(self.receive(pipe), {'type': 'direct', 'channel': channel})
+        finally:
+            for process in processes:
+                process.join(10)
+                if process.is_alive():
+                    process.terminate()
+        self.assertEqual([process.exitcode for process in processes], [0] * self.WORKERS)
+
+    def receive(self, pipe):
+        self.assertTrue(pipe.poll(10), 'worker process did not answer')
+        return pipe.recv()
+
+
+class PartialUploadTests(TestCase):
+    def setUp(self):
+        self.session = UploadSession.objects.create(
+            purpose='medic_picture', medic=create_medic('uploader'), filename='picture.jpg', total_size=8,
+            expires_at=upload_expiry(),
+        )
+
+    def tearDown(self):
+        if os.path.exists(partial_path(self.session)):
+            os.remove(partial_path(self.session))
+
+    def test_partial_files_are_not_served(self):
+        write_chunk(self.session, 0, io.BytesIO(b'1234'), 4)
+        path = partial_path(self.session)
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.abspath(path).startswith(os.path.abspath(settings.MEDIA_ROOT) + os.sep))
+
+    def test_resuming_without_the_partial_file_fails(self):
+        write_chunk(self.session, 0, io.BytesIO(b'1234'), 4)
+        os.remove(partial_path(self.session))
+        with self.assertRaises(UploadError):
+            write_chunk(self.session, 4, io.BytesIO(b'5678'), 4)
+
+
+class ResumableUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.nurse = create_patient('nurse')
+        self.medic = create_medic('uploader', user=self.nurse)
+        self.client = APIClient()
+        self.client.force_authenticate(self.nurse)
+
+    def start(self, total_size=8, filename='picture.jpg'):
+        return self.client.post('/api/uploads/', {
+            'purpose': 'medic_picture', 'medic': self.medic.id, 'filename': filename, 'total_size': total_size,
+        })
+
+    def put_chunk(self, session_id, offset, body):
+        self.addCleanup(self.remove_partial, session_id)
+        return self.client.put(
+            f'/api/uploads/{session_id}/', body, content_type='application/octet-stream',
+            headers={'Upload-Offset': str(offset)},
+        )
+
+    @staticmethod
+    def remove_partial(session_id):
+        path = os.path.join(uploads.UPLOAD_TEMP_DIR, f'{session_id}.part')
+        if os.path.exists(path):
+            os.remove(path)
+
+    def jpeg(self, size=(64, 48)):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        gps = exif.get_ifd(0x8825)
+        gps[1], gps[2] = 'N', (28.0, 36.0, 0.0)
+        output = io.BytesIO()
+        Image.new('RGB', size, 'red').save(output, 'JPEG', exif=exif)
+        return output.getvalue()
+
+    def process(self, data):
+        session = UploadSession.objects.create(
+            purpose='medic_picture', medic=self.medic, filename='picture.jpg', total_size=len(data),
+            expires_at=upload_expiry(), received_size=len(data), status='processing',
+        )
+        os.makedirs(uploads.UPLOAD_TEMP_DIR, exist_ok=True)
+        with open(partial_path(session), 'wb') as partial:
+            partial.write(data)
+        uploads.process_upload(session.id)
+        session.refresh_from_db()
+        return session
+
+    def test_only_the_medics_user_may_upload(self):
+        self.assertEqual(self.start().status_code, 201)
+        session_id = UploadSession.objects.get().id
+
+        self.client.force_authenticate(create_patient('stranger'))
+        self.assertEqual(self.start().status_code, 404)
+        self.assertEqual(self.client.get(f'/api/uploads/{session_id}/').status_code, 404)
+        self.assertEqual(self.put_chunk(session_id, 0, b'1234').status_code, 404)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.start().status_code, 403)
+
+    def test_chunks_must_continue_at_the_offset(self):
+        session_id = self.start().data['id']
+        self.assertEqual(self.put_chunk(session_id, 0, b'1234').data['offset'], 4)
+        response = self.put_chunk(session_id, 2, b'5678')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 4)
+
+    def test_chunks_past_the_declared_size_are_rejected(self):
+        session_id = self.start().data['id']
+        self.assertEqual(self.put_chunk(session_id, 0, b'123456789').status_code, 400)
+        self.assertEqual(UploadSession.objects.get(id=session_id).received_size, 0)
+
+    def test_metadata_is_stripped(self):
+        data = self.jpeg()
+        with Image.open(io.BytesIO(data)) as original:
+            self.assertTrue(original.getexif().get_ifd(0x8825))
+
+        session = self.process(data)
+        self.assertEqual(session.status, 'completed')
+        self.medic.refresh_from_db()
+        with Image.open(self.medic.picture.path) as stored:
+            self.assertEqual(dict(stored.getexif()), {})
+            self.assertNotIn('exif', stored.info)
+            self.assertEqual(stored.size, (64, 48))
+
+    def test_images_over_the_pixel_limit_are_rejected(self):
+        # PNG has no reduced-scale decode to fall back on
+        output = io.BytesIO()
+        Image.new('RGB', (100, 100)).save(output, 'PNG')
+        with mock.patch('medic.uploads.UPLOAD_MAX_PIXELS', 5000), self.assertLogs('medic.uploads', 'WARNING'):
+            session = self.process(output.getvalue())
+        self.assertEqual(session.status, 'failed')
+        self.assertIn('5000 pixels', session.error)
+        self.medic.refresh_from_db()
+        self.assertFalse(self.medic.picture)
+
+
+
+class FlakyTransport(FakeTransport):
+    """
+    Fails the first `failures` sends with `error`, then records like
+    FakeTransport.
+    """
+    def __init__(self, failures, error=ConnectionError('timed out')):
+        self.outbox = []
+        self.failures = failures
+        self.error = error
+
+    def send(self, phone_number, message):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        return super().send(phone_number, message)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def send(self, **data):
+        return self.client.post('/api/send-sms/', {'phone_number': '+15550000000', 'message': 'hi', **data}, format='json')
+
+    def deliver_due(self, transport):
+        return [outbox.deliver(sms, transport) for sms in outbox.claim_due_messages(10)]
+
+    def test_idempotency_key_dedupes(self):
+        first = self.send(idempotency_key='booking-1-otp')
+        second = self.send(idempotency_key='booking-1-otp')
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertNotEqual(self.send().data['id'], self.send().data['id'])
+        self.assertEqual(OutboundSms.objects.count(), 3)
+
+    def test_overlong_idempotency_key_is_rejected(self):
+        self.assertEqual(self.send(idempotency_key='k' * 101).status_code, 400)
+        self.assertEqual(self.send(idempotency_key=['k']).status_code, 400)
+        self.assertEqual(self.send(idempotency_key='k' * 100).status_code, 202)
+
+    def test_claimed_messages_are_not_claimed_again(self):
+        sms = outbox.enqueue_sms('+15550000000', 'hi')
+        self.assertEqual([claimed.id for claimed in outbox.claim_due_messages(10)], [sms.id])
+        self.assertEqual(outbox.claim_due_messages(10), [])
+
+        # A worker that died mid-send loses its claim after the timeout
+        stale = timezone.now() - timedelta(seconds=outbox.CLAIM_TIMEOUT_SECONDS + 1)
+        OutboundSms.objects.filter(id=sms.id).update(updated_at=stale)
+        self.assertEqual([claimed.id for claimed in outbox.claim_due_messages(10)], [sms.id])
+
+    def test_failed_sends_back_off_then_succeed(self):
+        sms = outbox.enqueue_sms('+15550000000', 'hi')
+        transport = FlakyTransport(failures=2)
+        delays = []
+        for attempt in (1, 2):
+            before = timezone.now()
+            with self.assertLogs('medic.outbox', 'WARNING'):
+                self.assertEqual(self.deliver_due(transport), [False])
+            sms.refresh_from_db()
+            self.assertEqual((sms.status, sms.attempts), ('pending', attempt))
+            delays.append((sms.next_attempt_at - before).total_seconds())
+            # Not due again until the backoff passes
+            self.assertEqual(outbox.claim_due_messages(10), [])
+            OutboundSms.objects.filter(id=sms.id).update(next_attempt_at=timezone.now())
+
+        base = outbox.RETRY_BASE_SECONDS
+        self.assertTrue(0.8 * base <= delays[0] <= 1.2 * base + 1, delays)
+        self.assertTrue(1.6 * base <= delays[1] <= 2.4 * base + 1, delays)
+
+        self.assertEqual(self.deliver_due(transport), [True])
+        sms.refresh_from_db()
+        self.assertEqual((sms.status, sms.attempts), ('sent', 3))
+        self.assertEqual(sms.provider_message_id, transport.outbox[0]['id'])
+
+    def test_permanent_errors_and_exhausted_attempts_fail(self):
+        rejected = outbox.enqueue_sms('+15550000000', 'hi')
+        with self.assertLogs('medic.outbox', 'WARNING'):
+            self.deliver_due(FlakyTransport(failures=1, error=PermanentSmsError('invalid number')))
+        rejected.refresh_from_db()
+        self.assertEqual((rejected.status, rejected.attempts), ('failed', 1))
+
+        exhausted = outbox.enqueue_sms('+15550000001', 'hi')
+        OutboundSms.objects.filter(id=exhausted.id).update(attempts=outbox.MAX_ATTEMPTS - 1)
+        with self.assertLogs('medic.outbox', 'WARNING'):
+            self.deliver_due(FlakyTransport(failures=1))
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, 'failed')
+
+class MediaAccessTests(TestCase):
+    """
+    Only pictures are public media; identity documents are served to their
+    medic and staff, and never cached.
+    """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        for name in ('pictures/face.jpg', 'identity_verification/id.jpg'):
+            os.makedirs(os.path.dirname(os.path.join(self.media_root, name)), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(b'data')
+
+        self.nurse = create_patient('nurse')
+        self.medic = create_medic('verified', user=self.nurse)
+        IdentityVerification.objects.create(medic=self.medic, document='identity_verification/id.jpg')
+        self.client = APIClient()
+
+    def test_only_pictures_are_public(self):
+        self.assertEqual(self.client.get('/media/pictures/face.jpg').status_code, 200)
+        self.assertEqual(self.client.get('/media/identity_verification/id.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/pictures/../identity_verification/id.jpg').status_code, 404)
+
+    def test_identity_document_needs_its_medic(self):
+        url = f'/api/medics/{self.medic.id}/identity-document/'
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(create_patient('stranger'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.force_authenticate(self.nurse)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'data')
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+
+class WriteBehindBufferTests(TransactionTestCase):
+    """
+    Foreign keys are only checked on commit, so these run outside the
+    test-case transaction.
+    """
+    def setUp(self):
+        self.patient = create_patient('chatter')
+        self.booking = Booking.objects.create(patient=self.patient, medic=create_medic('chat'), status='confirmed')
+        self.buffer = WriteBehindBuffer(flush_size=100, flush_interval=60)
+
+    def add_and_flush(self, *messages):
+        async def run():
+            for message in messages:
+                await self.buffer.add(message)
+            await self.buffer.flush()
+            timer, self.buffer.timer = self.buffer.timer, None
+            if timer is not None:
+                timer.cancel()
+            return timer
+        return async_to_sync(run)()
+
+    def test_rejected_rows_are_dropped_without_blocking_the_rest(self):
+        good = [new_message(self.booking.id, self.patient.id, f'hello {i}') for i in range(3)]
+        orphan = new_message(self.booking.id + 1000, self.patient.id, 'booking is gone')
+        with self.assertLogs('medic.chat', 'ERROR'):
+            timer = self.add_and_flush(good[0], orphan, *good[1:])
+
+        self.assertIsNone(timer)
+        self.assertEqual(self.buffer.pending, [])
+        self.assertEqual(
+            sorted(ChatMessage.objects.values_list('body', flat=True)),
+            ['hello 0', 'hello 1', 'hello 2'],
+        )
+
+    def test_failed_flush_is_kept_and_retried(self):
+        messages = [new_message(self.booking.id, self.patient.id, f'hello {i}') for i in range(3)]
+        with mock.patch('medic.chat.ChatMessage.objects.bulk_create', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('medic.chat', 'ERROR'):
+                timer = self.add_and_flush(*messages)
+        self.assertIsNotNone(timer)
+        self.assertEqual(self.buffer.pending, messages)
+
+        self.add_and_flush()
+        self.assertEqual(ChatMessage.objects.count(), 3)
+
+    def test_pending_messages_are_bounded(self):
+        self.buffer.max_pending = 2
+        messages = [new_message(self.booking.id, self.patient.id, f'hello {i}') for i in range(3)]
+        with mock.patch('medic.chat.ChatMessage.objects.bulk_create', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('medic.chat', 'ERROR'):
+                self.add_and_flush(*messages)
+        self.assertEqual(self.buffer.pending, messages[1:])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    A second SQLite file, copied from the primary, plays the "replica"
+    alias. Rows written to the primary after the copy show which database
+    served a read.
+    """
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Replica routing is exercised with SQLite files')
+        cache.clear()
+        health.clear()
+        self.client = APIClient()
+        self.medic = create_medic('replicated')
+        create_reviews(self.medic, 2)
+
+        replica_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, replica_dir)
+        self.replica_path = os.path.join(replica_dir, 'replica.sqlite3')
+        connection.ensure_connection()
+        with sqlite3.connect(self.replica_path) as replica:
+            connection.connection.backup(replica)
+        replica.close()
+
+        # Only on the primary from here on
+        Review.objects.create(medic=self.medic, social_user=SocialAuthData.objects.first(), description='', rating=5, status='active')
+        self.use_replica(self.replica_path)
+
+    def use_replica(self, path):
+        connections.settings['replica'] = dict(connection.settings_dict, NAME=path, TEST={'MIRROR': 'default'})
+        patcher = mock.patch('medic.routers.REPLICA_DATABASES', ['replica'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.drop_replica)
+
+    def drop_replica(self):
+        if 'replica' in connections.settings:
+            connections['replica'].close()
+            if hasattr(connections._connections, 'replica'):
+                delattr(connections._connections, 'replica')
+            del connections.settings['replica']
+
+    def review_count(self):
+        response = self.client.get('/api/reviews/', {'medic_id': self.medic.id})
+        self.assertEqual(response.status_code, 200)
+        return len(response.data['results'])
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.review_count(), 2)
+
+    def test_writes_go_to_the_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_write(Review), 'default')
+        token = read_alias.set('replica')
+        try:
+            Review.objects.create(medic=self.medic, social_user=SocialAuthData.objects.using('default').first(), description='', rating=1, status='active')
+        finally:
+            read_alias.reset(token)
+        self.assertEqual(Review.objects.using('default').count(), 4)
+        self.assertEqual(Review.objects.using('replica').count(), 2)
+
+    def test_client_reads_its_own_writes(self):
+        response = self.client.post('/api/send-sms/', {'phone_number': '+15550000000', 'message': 'hi'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.review_count(), 3)
+
+        # Other clients still read from the replica
+        self.client = APIClient(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.review_count(), 2)
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        self.drop_replica()
+        self.use_replica(os.path.join(self.replica_path, 'missing', 'replica.sqlite3'))
+        with self.assertLogs('medic.routers', 'WARNING'):
+            self.assertEqual(self.review_count(), 3)
+        self.assertFalse(health['replica'][0])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LocationStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.nurse = create_patient('streaming-nurse')
+        self.patient = create_patient('streaming-patient')
+        medic = create_medic('streaming', user=self.nurse)
+        self.booking = Booking.objects.create(patient=self.patient, medic=medic, status='confirmed')
+        interval = mock.patch('medic.consumers.LOCATION_INTERVAL', 0)
+        interval.start()
+        self.addCleanup(interval.stop)
+
+    def communicator(self, user):
+        router = URLRouter(websocket_urlpatterns)
+
+        async def application(scope, receive, send):
+            return await router(dict(scope, user=user), receive, send)
+        return WebsocketCommunicator(application, f'/ws/booking/{self.booking.id}/')
+
+    async def test_undecodable_frame_requests_a_resync(self):
+        medic = self.communicator(self.nurse)
+        patient = self.communicator(self.patient)
+        self.assertTrue((await medic.connect())[0])
+        self.assertTrue((await patient.connect())[0])
+
+        first = locations.to_micro(28.6, 77.2)
+        second = locations.to_micro(28.7, 77.3)
+        # A delta with no base, then a good start
+        await medic.send_to(bytes_data=locations.encode((1, 1), (0, 0)))
+        self.assertEqual(await medic.receive_json_from(), {'type': 'location_resync'})
+        await medic.send_to(bytes_data=locations.encode(first))
+        self.assertEqual(locations.decode(await patient.receive_from()), first)
+
+        # After a malformed frame the medic's base is unknown: deltas are
+        # ignored until the next absolute frame
+        await medic.send_to(bytes_data=b'\x02\x00')
+        self.assertEqual(await medic.receive_json_from(), {'type': 'location_resync'})
+        await medic.send_to(bytes_data=locations.encode((first[0] + 5, first[1] + 5), first))
+        self.assertTrue(await medic.receive_nothing())
+        await medic.send_to(bytes_data=locations.encode(second))
+        self.assertEqual(locations.decode(await patient.receive_from(), first), second)
+        self.assertTrue(await patient.receive_nothing())
+
+        await medic.disconnect()
+        await patient.disconnect()
+
+
+class AsyncBookingViewTests(TransactionTestCase):
+    def setUp(self):
+        self.booking = Booking.objects.create(
+            patient=create_patient('patient'), medic=create_medic('nurse', available=False), status='otp_sent', otp='1234',
+        )
+
+    def confirm(self, data, content_type):
+        return self.client.put(f'/api/async/booking/{self.booking.id}/confirm/', data, content_type=content_type)
+
+    def test_confirm_accepts_a_form_encoded_otp(self):
+        self.assertEqual(self.confirm('otp=9999', 'application/x-www-form-urlencoded').status_code, 400)
+        self.assertEqual(self.confirm('otp=1234', 'application/x-www-form-urlencoded').status_code, 200)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'confirmed')
+
+    def test_confirm_accepts_a_json_otp(self):
+        self.assertEqual(self.confirm({'otp': '1234'}, 'application/json').status_code, 200)
+
+
+class BookingDetailPrivacyTests(TransactionTestCase):
+    def setUp(self):
+        self.patient = CustomUser.objects.create_user(email='private@example.com', password='secret')
+        self.booking = Booking.objects.create(patient=self.patient, medic=create_medic('nurse'), status='confirmed')
+
+    def assert_public_patient(self, data):
+        self.assertEqual(set(data['patient']), {'id', 'email', 'first_name', 'last_name'})
+        self.assertNotIn(self.patient.password, str(data))
+
+    def test_detail_views_show_only_public_patient_details(self):
+        self.assert_public_patient(self.client.get(f'/api/bookings/{self.booking.id}/').json())
+        for prefix in ('/api/', '/api/async/'):
+            response = self.client.post(f'{prefix}bookings/recent/patient/', {'email': self.patient.email}, content_type='application/json')
+            self.assertEqual(response.status_code, 200, prefix)
+            self.assert_public_patient(response.json())
@@ -0,0 +1,218 @@
+"""
+Resumable chunked uploads of medic pictures and identity documents.
+
+Chunks are streamed to a partial file on local disk in small blocks. Once
+the last byte arrives the file is validated, re-encoded without metadata and
+moved to storage by a background worker pool, never the request thread.
+"""
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import IdentityVerification, UploadSession
+
+logger = logging.getLogger(__name__)
+
+# Suggested chunk size for clients, and the largest chunk accepted
+UPLOAD_CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 1024 * 1024)
+UPLOAD_MAX_CHUNK_SIZE = getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 * 1024)
+UPLOAD_MAX_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 30 * 1024 * 1024)
+# Bytes held in memory at a time while copying a chunk to disk
+UPLOAD_BLOCK_SIZE = 64 * 1024
+# Larger images are decoded at reduced scale (JPEG) or rejected, which
+# bounds a worker's decoded image at about 4 bytes per pixel
+UPLOAD_MAX_PIXELS = getattr(settings, 'UPLOAD_MAX_PIXELS', 24_000_000)
+UPLOAD_EXPIRY = getattr(settings, 'UPLOAD_EXPIRY', 24 * 60 * 60)
+# Partial files must stay outside MEDIA_ROOT, which MediaFilesMiddleware
+# serves publicly
+UPLOAD_TEMP_DIR = getattr(settings, 'UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'healthapp-uploads'))
+UPLOAD_PROCESSING_WORKERS = getattr(settings, 'UPLOAD_PROCESSING_WORKERS', 2)
+
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f'Expected a chunk starting at byte {offset}.')
+        self.offset = offset
+
+
+def partial_path(session):
+    return os.path.join(UPLOAD_TEMP_DIR, f'{session.id}.part')
+
+
+def validate_new_upload(filename, total_size):
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadError(f'Allowed file types: {", ".join(sorted(ALLOWED_EXTENSIONS))}.')
+    if total_size <= 0 or total_size > UPLOAD_MAX_SIZE:
+        raise UploadError(f'Size must be between 1 and {UPLOAD_MAX_SIZE} bytes.')
+
+
+def upload_expiry():
+    return timezone.now() + timedelta(seconds=UPLOAD_EXPIRY)
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Append `length` bytes read from `stream` at `offset`, which must be the
+    number of bytes received so far. Returns the updated session.
+    """
+    if session.status != 'uploading' or session.expires_at <= timezone.now():
+        raise UploadError('This upload is no longer accepting data.')
+    if offset != session.received_size:
+        raise OffsetMismatch(session.received_size)
+    if length <= 0 or length > UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks must be between 1 and {UPLOAD_MAX_CHUNK_SIZE} bytes.')
+    if offset + length > session.total_size:
+        raise UploadError('Chunk extends past the declared upload size.')
+
+    path = partial_path(session)
+    if offset and not os.path.exists(path):
+        # Appending would leave a hole where the earlier chunks were
+        raise UploadError('The partial file for this upload is gone; start a new upload.')
+    os.makedirs(UPLOAD_TEMP_DIR, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    written = 0
+    with os.fdopen(fd, 'wb') as partial:
+        partial.seek(offset)
+        while written < length:
+            block = stream.read(min(UPLOAD_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            partial.write(block)
+            written += len(block)
+    if written != length:
+        # Nothing is acknowledged, so the client resends the whole chunk
+        raise UploadError('Chunk body is shorter than its declared length.')
+
+    # Only one of two racing writers of the same chunk may advance the offset
+    received = offset + written
+    status = 'processing' if received == session.total_size else 'uploading'
+    advanced = UploadSession.objects.filter(id=session.id, received_size=offset, status='uploading').update(
+        received_size=received, status=status, updated_at=timezone.now()
+    )
+    session.refresh_from_db()
+    if not advanced:
+        raise OffsetMismatch(session.received_size)
+
+    if status == 'processing':
+        get_executor().submit(process_upload_in_thread, session.id)
+    return session
+
+
+def open_bounded(path):
+    """
+    Open an image whose decoded size stays within UPLOAD_MAX_PIXELS.
+    """
+    with Image.open(path) as image:
+        image.verify()
+
+    image = Image.open(path)
+    width, height = image.size
+    if width * height > UPLOAD_MAX_PIXELS:
+        # Ask the JPEG decoder for a 1/2, 1/4 or 1/8 scale that fits
+        scale = (width * height / UPLOAD_MAX_PIXELS) ** 0.5
+        image.draft('RGB', (int(width / scale), int(height / scale)))
+        if image.width * image.height > UPLOAD_MAX_PIXELS:
+            image.close()
+            raise UploadError(f'Image is larger than {UPLOAD_MAX_PIXELS} pixels.')
+    return image
+
+
+def strip_metadata(path, output):
+    """
+    Re-encode the image at `path` into `output` with its EXIF orientation
+    applied and all metadata (EXIF, GPS, comments) dropped.
+    """
+    with open_bounded(path) as image:
+        image_format = image.format
+        cleaned = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG':
+            cleaned.convert('RGB').save(output, 'JPEG', quality=90, optimize=True)
+        else:
+            cleaned.save(output, image_format)
+    return image_format
+
+
+def store_result(session, output):
+    name = os.path.basename(session.filename)
+    medic = session.medic
+    if session.purpose == 'medic_picture':
+        medic.picture.save(name, File(output), save=False)
+        # Saving with the picture field builds its variants (medic.signals)
+        medic.save(update_fields=['picture', 'updated_at'])
+        return medic.picture.name
+
+    verification = IdentityVerification.objects.filter(medic=medic).first() or IdentityVerification(medic=medic)
+    # A new document needs verifying again
+    verification.verified = False
+    verification.verified_at = None
+    verification.document.save(name, File(output), save=True)
+    return verification.document.name
+
+
+def process_upload(session_id):
+    session = UploadSession.objects.select_related('medic').get(id=session_id)
+    path = partial_path(session)
+    try:
+        with tempfile.TemporaryFile() as output:
+            strip_metadata(path, output)
+            output.seek(0)
+            result = store_result(session, output)
+    except (OSError, ValueError, UploadError, Image.DecompressionBombError) as e:
+        logger.warning(f"Upload {session.id} failed processing: {e}")
+        UploadSession.objects.filter(id=session.id).update(status='failed', error=str(e), updated_at=timezone.now())
+    else:
+        UploadSession.objects.filter(id=session.id).update(status='completed', result=result, updated_at=timezone.now())
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def process_upload_in_thread(session_id):
+    try:
+        return process_upload(session_id)
+    except Exception:
+        logger.exception(f"Upload {session_id} processing crashed")
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # A small fixed pool bounds how many images are decoded at once
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=UPLOAD_PROCESSING_WORKERS, thread_name_prefix='upload-processing')
+        return _executor
+
+
+def purge_expired_uploads():
+    """
+    Delete unfinished sessions past their expiry along with their partial
+    files. Returns how many were removed.
+    """
+    expired = list(UploadSession.objects.filter(expires_at__lte=timezone.now()).exclude(status='completed'))
+    for session in expired:
+        path = partial_path(session)
+        if os.path.exists(path):
+            os.remove(path)
+    UploadSession.objects.filter(id__in=[session.id for session in expired]).delete()
+    return len(expired)
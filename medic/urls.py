@@ -1,10 +1,12 @@
 from django.urls import path
-from .views import MedicListCreateAPIView, MedicRetrieveUpdateDestroyAPIView, send_sms_api,  SocialAuthDataListCreateAPIView, ReviewListCreateAPIView, update_availabilty, logout_view, InitiateBookingView, ConfirmBookingView, CancelBookingView, UpdateBookingView, BookingListAPIView, BookingRetrieveAPIView, RecentPatientBookingView, RecentNurseBookingView, CompleteBookingView
+from . import async_views
+from .views import MedicListCreateAPIView, medic_search_cache_stats, MedicRetrieveUpdateDestroyAPIView, send_sms_api,  SocialAuthDataListCreateAPIView, ReviewListCreateAPIView, update_availabilty, logout_view, InitiateBookingView, ConfirmBookingView, CancelBookingView, UpdateBookingView, BookingListAPIView, BookingRetrieveAPIView, RecentPatientBookingView, RecentNurseBookingView, CompleteBookingView, create_upload, upload_detail, identity_document
 
 # If you're using generic views
 urlpatterns = [
     path('medics/', MedicListCreateAPIView.as_view(), name='medic-list-create'),
     path('medics/<int:pk>/', MedicRetrieveUpdateDestroyAPIView.as_view(), name='medic-retrieve-update-destroy'),
+    path('medics/search-cache/', medic_search_cache_stats, name='medic-search-cache-stats'),
     path('social-auth-data/', SocialAuthDataListCreateAPIView.as_view(), name='social-user-create'),
     path('reviews/', ReviewListCreateAPIView.as_view(), name='review-list-create'),
     path('send-sms/', send_sms_api, name='send-sms'),
@@ -19,4 +21,15 @@ urlpatterns = [
     path('booking/<int:pk>/cancel/', CancelBookingView.as_view(), name='cancel-booking'),
     path('bookings/recent/patient/', RecentPatientBookingView.as_view(), name='recent-patient-booking'),
     path('bookings/recent/nurse/', RecentNurseBookingView.as_view(), name='recent-nurse-booking'),
+    path('uploads/', create_upload, name='create-upload'),
+    path('uploads/<uuid:pk>/', upload_detail, name='upload-detail'),
+    path('medics/<int:pk>/identity-document/', identity_document, name='identity-document'),
+    # Async booking lifecycle for the ASGI deployment
+    path('async/booking/initiate/', async_views.initiate_booking_view, name='async-initiate-booking'),
+    path('async/booking/<int:pk>/update/', async_views.update_booking_view, name='async-update-booking'),
+    path('async/booking/<int:pk>/confirm/', async_views.confirm_booking_view, name='async-confirm-booking'),
+    path('async/booking/<int:pk>/complete/', async_views.complete_booking_view, name='async-complete-booking'),
+    path('async/booking/<int:pk>/cancel/', async_views.cancel_booking_view, name='async-cancel-booking'),
+    path('async/bookings/recent/patient/', async_views.recent_patient_booking_view, name='async-recent-patient-booking'),
+    path('async/bookings/recent/nurse/', async_views.recent_nurse_booking_view, name='async-recent-nurse-booking'),
 ]
\ No newline at end of file
@@ -1,8 +1,25 @@
-from math import radians, sin, cos, sqrt, atan2
+from math import radians, sin, cos, sqrt, atan2, floor
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+# Radius of the Earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+# Size of a spatial grid cell in degrees (~11 km of latitude)
+GRID_CELL_DEGREES = 0.1
+
+# Above this many cells a medic's coverage is indexed by whole grid rows
+MAX_COVERAGE_CELLS = 10000
+# Column recorded for a row covered across all of its columns; real columns
+# lie within +-1800
+WHOLE_ROW = 999999
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     # Radius of the Earth in kilometers
-    R = 6371.0
+    R = EARTH_RADIUS_KM
     
     # Convert latitude and longitude from degrees to radians
     lat1 = radians(lat1)
@@ -23,3 +40,71 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     distance = R * c
     
     return distance
+
+def calculate_distances(lat, lon, latitudes, longitudes):
+    """
+    Haversine distances in kilometers from one point to many. Uses a single
+    NumPy pass when available and falls back to a plain Python loop.
+    """
+    if np is None:
+        return [calculate_distance(lat, lon, lat2, lon2) for lat2, lon2 in zip(latitudes, longitudes)]
+
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def coverage_mask(lat, lon, latitudes, longitudes, radii):
+    """
+    Return (mask, distances) where mask[i] is True when the point lies within
+    radii[i] kilometers of (latitudes[i], longitudes[i]).
+    """
+    distances = calculate_distances(lat, lon, latitudes, longitudes)
+    if np is None:
+        mask = [distance <= radius for distance, radius in zip(distances, radii)]
+        return mask, distances
+
+    mask = distances <= np.asarray(radii, dtype=np.float64)
+    return mask.tolist(), distances.tolist()
+
+def grid_cell(lat, lon):
+    # Bucket a coordinate into its (row, col) grid cell
+    return floor(lat / GRID_CELL_DEGREES), floor(lon / GRID_CELL_DEGREES)
+
+def bounding_cells(lat, lon, radius_km):
+    """
+    Return ((min_row, max_row), (min_col, max_col)) covering every grid cell
+    within radius_km of the point. The column range is None when the box
+    wraps a pole or the antimeridian and longitude can't be bounded.
+    """
+    dlat = radius_km / 111.0
+    min_lat, max_lat = lat - dlat, lat + dlat
+    rows = (grid_cell(min_lat, lon)[0], grid_cell(max_lat, lon)[0])
+
+    # Longitude degrees shrink with latitude; use the widest edge of the box
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 89.0:
+        return rows, None
+
+    dlon = radius_km / (111.0 * cos(radians(widest)))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180.0 or max_lon > 180.0:
+        return rows, None
+
+    cols = (grid_cell(lat, min_lon)[1], grid_cell(lat, max_lon)[1])
+    return rows, cols
+
+def coverage_cells(lat, lon, radius_km):
+    """
+    Return the (row, col) grid cells within radius_km of the point. col is
+    WHOLE_ROW for a row covered across all of its columns, used when
+    longitude can't be bounded or the box would span too many cells.
+    """
+    rows, cols = bounding_cells(lat, lon, radius_km)
+    row_range = range(rows[0], rows[1] + 1)
+    if cols is None or len(row_range) * (cols[1] - cols[0] + 1) > MAX_COVERAGE_CELLS:
+        return [(row, WHOLE_ROW) for row in row_range]
+    return [(row, col) for row in row_range for col in range(cols[0], cols[1] + 1)]
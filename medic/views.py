@@ -1,50 +1,165 @@
 from rest_framework import generics, permissions
 from .models import Medic, SocialAuthData, Review, Booking
-from .serializers import MedicSerializer, SocialAuthDataSerializer, ReviewSerializer, BookingSerializer
+from .serializers import MedicSerializer, MedicSummarySerializer, SocialAuthDataSerializer, ReviewSerializer, BookingSerializer, BookingListSerializer, UploadSessionSerializer, requested_fields
 from .models import CustomUser
-from .utils import calculate_distance
+from .utils import WHOLE_ROW, coverage_mask, grid_cell
+from .pagination import BookingCursorPagination, DistanceCursorPagination, ReviewCursorPagination
+from .search import search_medic_ids
+from .bookings import BOOKING_VERSION_FIELDS, MedicUnavailable, InvalidTransition, booking_etag, initiate_booking, share_location, transition, transition_booking
+from django.db import IntegrityError
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.decorators import permission_classes
+from django.core.cache import cache
+from .cache import SEARCH_CACHE_TIMEOUT, coverage_cache_key, etag_matches, search_cache_key, record_hit, record_miss, search_cache_stats
 from rest_framework import status
-from django.db.models import Q
+from django.db.models import Q, Case, When, prefetch_related_objects
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .sms_client import send_sms
+from .outbox import enqueue_sms
+from .routers import ReplicaReadMixin
+from .models import IdentityVerification, OutboundSms, UploadSession
+from .uploads import UPLOAD_CHUNK_SIZE, OffsetMismatch, UploadError, upload_expiry, validate_new_upload, write_chunk
 from django.contrib.auth import login
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
+import math
 
-class MedicListCreateAPIView(generics.ListCreateAPIView):
+# Most results a search-term query returns, best match first
+SEARCH_RESULT_LIMIT = 50
+
+class MedicListCreateAPIView(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = Medic.objects.all()
     serializer_class = MedicSerializer
+    pagination_class = DistanceCursorPagination
 
     def get_queryset(self):
-        queryset = Medic.objects.all()
+        queryset = Medic.objects.select_related('location')
         lat = self.request.query_params.get('lat')
         lon = self.request.query_params.get('lon')
         search_query = self.request.query_params.get('search')
         
         # Check if lat and lon are provided
         if lat is not None and lon is not None:
-            # Convert lat and lon to float
-            lat = float(lat)
-            lon = float(lon)
+            lat = self.parse_coordinate('lat', lat)
+            lon = self.parse_coordinate('lon', lon)
     
             # Filter nurses based on coverage radius
-            queryset = [
-                nurse for nurse in queryset
-                if calculate_distance(lat, lon, nurse.location.latitude, nurse.location.longitude) <= nurse.area_coverage_km
-            ]
+            queryset = self.filter_by_coverage(queryset, lat, lon)
         elif search_query:
-            queryset = queryset.filter(
+            queryset = self.filter_by_search(queryset, search_query).prefetch_related(*self.get_prefetch_lookups())
+            if self.request.query_params.get('ordering') == '-rating':
+                queryset = queryset.order_by('-rating_avg', 'id')
+        else:
+            # If lat and lon are not provided, return an empty queryset
+            queryset = queryset.none()
+
+        return queryset
+
+    @staticmethod
+    def parse_coordinate(name, value):
+        # NaN and infinity have no grid cell
+        try:
+            coordinate = float(value)
+        except ValueError:
+            coordinate = None
+        if coordinate is None or not math.isfinite(coordinate):
+            raise ValidationError({name: 'A valid number is required.'})
+        return coordinate
+
+    def list(self, request, *args, **kwargs):
+        self.cache_status = None
+        cache_key = search_cache_key(request)
+        if cache_key is None:
+            response = super().list(request, *args, **kwargs)
+            # Set by filter_by_coverage for nearest-medic searches
+            if self.cache_status is not None:
+                response['X-Cache'] = self.cache_status
+            return response
+
+        data = cache.get(cache_key)
+        if data is not None:
+            record_hit()
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        record_miss()
+        response = super().list(request, *args, **kwargs)
+        cache.set(cache_key, response.data, SEARCH_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_serializer_class(self):
+        # Searches return the compact summary; creation takes the full medic
+        if self.request.method == 'GET':
+            return MedicSummarySerializer
+        return MedicSerializer
+
+    def get_prefetch_lookups(self):
+        return self.get_serializer_class().get_prefetch_lookups(requested_fields(self.request))
+
+    def filter_by_search(self, queryset, search_query):
+        medic_ids = search_medic_ids(search_query, SEARCH_RESULT_LIMIT)
+        if medic_ids is None:
+            # No full-text index on this database
+            return queryset.filter(
                 Q(name__icontains=search_query) |
                 Q(email__icontains=search_query) |
                 Q(expertise__name__icontains=search_query)
             ).distinct()
+
+        # Keep the relevance order from the index
+        ranking = Case(*[When(id=medic_id, then=position) for position, medic_id in enumerate(medic_ids)])
+        return queryset.filter(id__in=medic_ids).order_by(ranking)
+
+    def filter_by_coverage(self, queryset, lat, lon):
+        # Medics are indexed under every grid cell their coverage reaches, so
+        # the candidates are those covering the point's cell and their number
+        # depends on local density rather than fleet size or the widest radius
+        row, col = grid_cell(lat, lon)
+        cache_key = coverage_cache_key(row, col)
+        candidates = cache.get(cache_key)
+        if candidates is None:
+            record_miss()
+            self.cache_status = 'MISS'
+            candidates = list(queryset.filter(
+                coverage_cells__grid_row=row,
+                coverage_cells__grid_col__in=[col, WHOLE_ROW],
+                area_coverage_km__isnull=False,
+            ))
+            cache.set(cache_key, candidates, SEARCH_CACHE_TIMEOUT)
         else:
-            # If lat and lon are not provided, return an empty queryset
-            queryset = queryset.none()
+            record_hit()
+            self.cache_status = 'HIT'
+
+        # Exact haversine check on the remaining candidates in one batch
+        mask, distances = coverage_mask(
+            lat, lon,
+            [nurse.location.latitude for nurse in candidates],
+            [nurse.location.longitude for nurse in candidates],
+            [nurse.area_coverage_km for nurse in candidates],
+        )
 
-        return queryset
+        nurses = []
+        for nurse, covered, distance in zip(candidates, mask, distances):
+            if covered:
+                nurse.distance_km = distance
+                nurses.append(nurse)
+        return nurses
+
+    def paginate_queryset(self, queryset):
+        # Only nearest-medic searches are paginated, ordered by distance
+        params = self.request.query_params
+        if params.get('lat') is None or params.get('lon') is None:
+            return None
+        page = super().paginate_queryset(queryset)
+
+        # Load related data for the selected page only
+        prefetch_related_objects(page, *self.get_prefetch_lookups())
+        return page
     
     def perform_create(self, serializer):
         # Handle additional logic during Medic creation if necessary
@@ -61,6 +176,9 @@ class MedicRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Medic.objects.all()
     serializer_class = MedicSerializer
 
+    def get_queryset(self):
+        return MedicSerializer.setup_eager_loading(Medic.objects.all(), requested_fields(self.request))
+
 class SocialAuthDataListCreateAPIView(generics.ListCreateAPIView):
     queryset = SocialAuthData.objects.all()
     serializer_class = SocialAuthDataSerializer
@@ -97,19 +215,34 @@ class SocialAuthDataListCreateAPIView(generics.ListCreateAPIView):
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
         user = self.request.user
-        medic = Medic.objects.filter(user=user).first()
+        medic = MedicSerializer.setup_eager_loading(Medic.objects.filter(user=user)).first()
         if medic:
             medic_data = MedicSerializer(medic).data
             response.data['medic'] = medic_data
         return response
 
-class ReviewListCreateAPIView(generics.ListCreateAPIView):
+class ReviewListCreateAPIView(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = ReviewCursorPagination
 
     def get_queryset(self):
-        return Review.objects.filter(status='active')
+        queryset = Review.objects.filter(status='active')
+
+        medic_id = self.request.query_params.get('medic_id')
+        if medic_id is not None:
+            if not medic_id.isdigit():
+                raise ValidationError({'medic_id': 'A valid integer is required.'})
+            queryset = queryset.filter(medic_id=medic_id)
+
+        queryset = queryset.select_related('medic').prefetch_related('medic__expertise')
+        return ReviewSerializer.setup_eager_loading(queryset)
     
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def medic_search_cache_stats(request):
+    return Response(search_cache_stats(), status=status.HTTP_200_OK)
+
 @api_view(['POST'])
 def send_sms_api(request):
     if request.method == 'POST':
@@ -119,12 +252,14 @@ def send_sms_api(request):
         if not phone_number or not message:
             return Response({'error': 'phone_number and message are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Call the send_sms function
-            send_sms(phone_number, message)
-            return Response({'success': 'SMS sent successfully'}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        idempotency_key = request.data.get('idempotency_key')
+        max_length = OutboundSms._meta.get_field('idempotency_key').max_length
+        if idempotency_key is not None and (not isinstance(idempotency_key, str) or len(idempotency_key) > max_length):
+            return Response({'error': f'idempotency_key must be a string of at most {max_length} characters'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Delivered by the outbox worker; retries reuse the same key
+        sms = enqueue_sms(phone_number, message, idempotency_key=idempotency_key)
+        return Response({'success': 'SMS queued for delivery', 'id': sms.id}, status=status.HTTP_202_ACCEPTED)
 
 @api_view(['POST'])
 def update_availabilty(request):
@@ -141,7 +276,7 @@ def update_availabilty(request):
             return Response({'error': 'Medic not found'}, status=status.HTTP_404_NOT_FOUND)
 
         medic.available = available
-        medic.save()
+        medic.save(update_fields=['available', 'updated_at'])
 
         return Response({'success': 'Availability updated successfully'}, status=status.HTTP_200_OK)
     
@@ -153,20 +288,70 @@ def logout_view(request):
         logout(request)
         return Response({'success': 'Logged out successfully'}, status=status.HTTP_200_OK)
     
-import random
-
-def generate_otp():
-    return str(random.randint(1000, 9999))
-
-class BookingListAPIView(generics.ListAPIView):
+class BookingListAPIView(ReplicaReadMixin, generics.ListAPIView):
     queryset = Booking.objects.all()
-    serializer_class = BookingSerializer
+    serializer_class = BookingListSerializer
+    pagination_class = BookingCursorPagination
 
-class BookingRetrieveAPIView(generics.RetrieveAPIView):
+    def get_queryset(self):
+        queryset = Booking.objects.all()
+        params = self.request.query_params
+
+        statuses = params.get('status')
+        if statuses:
+            statuses = statuses.split(',')
+            valid = {choice for choice, _ in Booking.STATUS_CHOICES}
+            if not set(statuses) <= valid:
+                raise ValidationError({'status': f'Choose from {", ".join(sorted(valid))}.'})
+            queryset = queryset.filter(status__in=statuses)
+
+        for param in ('medic', 'patient'):
+            value = params.get(param)
+            if value is not None:
+                if not value.isdigit():
+                    raise ValidationError({param: 'A valid integer is required.'})
+                queryset = queryset.filter(**{f'{param}_id': value})
+
+        for param, lookup in (('created_after', 'created_at__gte'), ('created_before', 'created_at__lt')):
+            value = params.get(param)
+            if value is not None:
+                queryset = queryset.filter(**{lookup: parse_date_param(param, value)})
+
+        return BookingListSerializer.setup_eager_loading(queryset)
+
+def parse_date_param(name, value):
+    # Accepts a date (midnight) or a full ISO 8601 datetime
+    try:
+        parsed = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Use an ISO 8601 date or datetime.'})
+    if not isinstance(parsed, datetime):
+        parsed = datetime.combine(parsed, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+class BookingRetrieveAPIView(ReplicaReadMixin, generics.RetrieveAPIView):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
 
-class RecentPatientBookingView(generics.GenericAPIView):
+class RecentBookingMixin:
+    """
+    Answers with 304 when the client's If-None-Match still matches the
+    booking's version, so polling clients skip the serialization.
+    """
+    def booking_response(self, request, version):
+        etag = booking_etag(version)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        booking = BookingSerializer.setup_eager_loading(Booking.objects.filter(id=version['id'])).get()
+        serializer = self.get_serializer(booking)
+        return Response(serializer.data, headers={'ETag': etag})
+
+class RecentPatientBookingView(RecentBookingMixin, generics.GenericAPIView):
     serializer_class = BookingSerializer
 
     def post(self, request, *args, **kwargs):
@@ -174,21 +359,17 @@ class RecentPatientBookingView(generics.GenericAPIView):
         if not email:
             return Response({'error': 'Email parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        bookings = Booking.objects.filter(patient__email=email, status__in=['initiated', 'location_shared', 'in_progress', 'confirmed'])
-
-        if bookings.count() > 1:
-            most_recent_booking = bookings.order_by('-created_at').first()
-            bookings.exclude(id=most_recent_booking.id).update(status='cancelled')
-        else:
-            most_recent_booking = bookings.first()
+        # unique_active_booking_per_patient guarantees at most one match
+        version = Booking.objects.filter(
+            patient__email=email, status__in=Booking.ACTIVE_STATUSES
+        ).order_by('-created_at').values(*BOOKING_VERSION_FIELDS).first()
 
-        if most_recent_booking:
-            serializer = self.get_serializer(most_recent_booking)
-            return Response(serializer.data)
+        if version:
+            return self.booking_response(request, version)
         else:
             return Response({'error': 'No active bookings found'}, status=status.HTTP_404_NOT_FOUND)
 
-class RecentNurseBookingView(generics.GenericAPIView):
+class RecentNurseBookingView(RecentBookingMixin, generics.GenericAPIView):
     serializer_class = BookingSerializer
 
     def post(self, request, *args, **kwargs):
@@ -196,17 +377,16 @@ class RecentNurseBookingView(generics.GenericAPIView):
         if not email:
             return Response({'error': 'Email parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        bookings = Booking.objects.filter(medic__user__email=email, status__in=['initiated', 'location_shared', 'in_progress', 'confirmed'])
+        bookings = Booking.objects.filter(medic__user__email=email, status__in=Booking.ACTIVE_STATUSES)
 
-        if bookings.count() > 1:
-            most_recent_booking = bookings.order_by('-created_at').first()
-            bookings.exclude(id=most_recent_booking.id).update(status='cancelled')
-        else:
-            most_recent_booking = bookings.first()
+        version = bookings.order_by('-created_at').values(*BOOKING_VERSION_FIELDS).first()
 
-        if most_recent_booking:
-            serializer = self.get_serializer(most_recent_booking)
-            return Response(serializer.data)
+        if version:
+            # Older open bookings for this nurse are stale
+            stale = bookings.exclude(id=version['id'])
+            if stale.exists():
+                transition(stale, 'cancelled')
+            return self.booking_response(request, version)
         else:
             return Response({'error': 'No active bookings found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -223,23 +403,13 @@ class InitiateBookingView(generics.CreateAPIView):
         medic_profile = get_object_or_404(Medic, id=medic_id)
         patient_profile = get_object_or_404(CustomUser, email=patient_email)
 
-        # Check if the nurse is available
-        if not medic_profile.available:
+        try:
+            booking, _ = initiate_booking(patient_profile, medic_profile, latitude=latitude, longitude=longitude)
+        except MedicUnavailable:
             return Response({'error': 'Medic is not available for booking.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Create the booking
-        booking = Booking(
-            patient=patient_profile,
-            medic=medic_profile,
-            status='initiated',
-            latitude=latitude,
-            longitude=longitude
-        )
-        booking.save()
-
-        # Set nurse as unavailable
-        medic_profile.available = False
-        medic_profile.save()
+        except IntegrityError:
+            # Another booking for this patient was created concurrently
+            return Response({'error': 'Patient already has an active booking.'}, status=status.HTTP_409_CONFLICT)
 
         serializer = BookingSerializer(booking)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -251,30 +421,12 @@ class UpdateBookingView(generics.UpdateAPIView):
     def update(self, request, *args, **kwargs):
         booking = self.get_object()
 
-        if booking.status != 'initiated':
-            return Response({'error': 'Invalid booking status.'}, status=status.HTTP_400_BAD_REQUEST)
-
         serializer = self.get_serializer(booking, data=request.data, partial=True)
         if serializer.is_valid():
-            otp = generate_otp()
-            booking.otp = otp
-            booking.status = 'location_shared'
-            booking.medic.available = False
-            booking.medic.save()
-            booking.save()
-
-        # Send WebSocket message to notify nurse
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'booking_{booking.id}',
-                {
-                    'type': 'booking_update',
-                    'message': 'Location shared by patient'
-                }
-            )
-
-            # Send OTP to patient's phone number
-            send_sms(booking.medic.phone_number, f"Your booking has been confirmed, Please use this OTP {otp} once the provider arrives. Thank You! Nursera Team.")
+            try:
+                share_location(booking)
+            except InvalidTransition:
+                return Response({'error': 'Invalid booking status.'}, status=status.HTTP_400_BAD_REQUEST)
             
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -292,20 +444,10 @@ class ConfirmBookingView(generics.UpdateAPIView):
             return Response({'error': 'OTP is incorrect.'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Update booking status and make nurse available again
-        booking.status = 'confirmed'
-        booking.medic.available = True
-        booking.medic.save()
-        booking.save()
-        
-        # Send WebSocket message to patient
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-                f'booking_{booking.id}',
-                {
-                    'type': 'booking_update',
-                    'message': 'Booking confirmed and completed.'
-                }
-            )
+        try:
+            transition_booking(booking.id, 'confirmed')
+        except InvalidTransition:
+            return Response({'error': 'Invalid booking status.'}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'status': 'Booking confirmed.'})
 
@@ -317,10 +459,10 @@ class CompleteBookingView(generics.UpdateAPIView):
         booking = self.get_object()
 
         # Update booking status and make nurse available again
-        booking.status = 'completed'
-        booking.medic.available = True
-        booking.medic.save()
-        booking.save()
+        try:
+            transition_booking(booking.id, 'completed')
+        except InvalidTransition:
+            return Response({'error': 'Invalid booking status.'}, status=status.HTTP_400_BAD_REQUEST)
        
         return Response({'status': 'Booking confirmed and completed.'})
 
@@ -330,9 +472,87 @@ class CancelBookingView(generics.UpdateAPIView):
 
     def update(self, request, *args, **kwargs):
         booking = self.get_object()
-        booking.status = 'cancelled'
-        booking.medic.available = True
-        booking.medic.save()
-        booking.save()
+        try:
+            transition_booking(booking.id, 'cancelled')
+        except InvalidTransition:
+            return Response({'error': 'Invalid booking status.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({'status': 'Booking cancelled.'})
\ No newline at end of file
+        return Response({'status': 'Booking cancelled.'})
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def create_upload(request):
+    """
+    Start a resumable upload for the signed-in medic's own picture or
+    identity document; chunks are then PUT to the returned session.
+    """
+    serializer = UploadSessionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    medic = serializer.validated_data['medic']
+    if medic.user_id is None or medic.user_id != request.user.id:
+        return Response({'error': 'Medic not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        validate_new_upload(serializer.validated_data['filename'], serializer.validated_data['total_size'])
+    except UploadError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    session = serializer.save(expires_at=upload_expiry())
+    return Response(dict(UploadSessionSerializer(session).data, chunk_size=UPLOAD_CHUNK_SIZE), status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def identity_document(request, pk):
+    """
+    A medic's identity document, for that medic's own user and staff only.
+    MediaFilesMiddleware never serves it, and no cache may keep a copy.
+    """
+    verification = get_object_or_404(IdentityVerification.objects.select_related('medic'), medic_id=pk)
+    if not request.user.is_staff and verification.medic.user_id != request.user.id:
+        raise Http404
+    try:
+        document = verification.document.open('rb')
+    except (ValueError, FileNotFoundError):
+        # No document uploaded, or its file is gone
+        raise Http404
+    response = FileResponse(document)
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+def chunk_offset(request):
+    # "Content-Range: bytes <start>-<end>/<total>" or "Upload-Offset: <start>"
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        unit, _, byte_range = content_range.partition(' ')
+        if unit != 'bytes':
+            raise ValueError(content_range)
+        return int(byte_range.split('-', 1)[0])
+    return int(request.headers.get('Upload-Offset', 0))
+
+@api_view(['GET', 'PUT'])
+@permission_classes([permissions.IsAuthenticated])
+def upload_detail(request, pk):
+    """
+    GET reports the offset to resume from; PUT appends the raw request body
+    at the given offset. The body is streamed to disk, never parsed. Only the
+    medic user who started the upload may see or continue it.
+    """
+    session = get_object_or_404(UploadSession, pk=pk, medic__user=request.user)
+    if request.method == 'GET':
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_200_OK)
+
+    try:
+        offset = chunk_offset(request)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return Response({'error': 'Invalid Content-Range, Upload-Offset or Content-Length'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        session = write_chunk(session, offset, request.stream, length)
+    except OffsetMismatch as e:
+        return Response({'error': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+    except UploadError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    code = status.HTTP_202_ACCEPTED if session.status == 'processing' else status.HTTP_200_OK
+    return Response(UploadSessionSerializer(session).data, status=code)